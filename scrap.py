@@ -5948,6 +5948,8 @@ class WebScraperApp:
                     engine.fuzz(fuzz_file)
                     result = engine.discover()  # Obtener resultado actualizado
                 
+                engine.close()
+                
                 # Mostrar resultados
                 self.root.after(0, lambda: self._show_discovery_results(result))
                 
@@ -434,6 +434,7 @@ class ScrapelilloEngine:
                 engine.fuzz(options['fuzz_file'])
                 result = engine.discover()  # Obtener resultado actualizado
             
+            engine.close()
             return result
             
         except Exception as e:
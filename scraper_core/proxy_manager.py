@@ -6,13 +6,15 @@ Supports multiple sources and rotation strategies.
 """
 
 import os
+import re
 import time
 import random
 import logging
 import asyncio
 import aiohttp
 import requests
-from typing import Dict, List, Optional, Any, Union
+import numpy as np
+from typing import Dict, List, Optional, Any, Tuple, Union
 from dataclasses import dataclass, field
 from datetime import datetime, timedelta
 from pathlib import Path
@@ -20,8 +22,56 @@ import threading
 from urllib.parse import urlparse
 import json
 
+try:
+    import uvloop
+    UVLOOP_AVAILABLE = True
+except ImportError:
+    UVLOOP_AVAILABLE = False
+
+try:
+    from numba import njit, prange
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
 logger = logging.getLogger(__name__)
 
+# Use the libuv-based event loop for proxy validation when available
+if UVLOOP_AVAILABLE:
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+
+# Delimiters accepted between proxies in environment variables
+_ENV_SPLIT_RE = re.compile(r'[,;\n]+')
+
+# Pools at least this large use the JIT-compiled weight kernel
+NUMBA_MIN_POOL_SIZE = 1000
+
+
+def _compute_weights_numpy(speed: np.ndarray, uptime: np.ndarray,
+                           failure_count: np.ndarray) -> np.ndarray:
+    """Compute proxy weights from speed, uptime and failure count (0 = unknown)"""
+    weights = np.where(speed != 0, speed / 1000.0, 1.0)
+    weights *= np.where(uptime != 0, uptime / 100.0, 1.0)
+    weights *= np.maximum(0.1, 1.0 - failure_count * 0.3)
+    return weights
+
+
+if NUMBA_AVAILABLE:
+    @njit(parallel=True, fastmath=True, cache=True)
+    def _compute_weights_jit(speed, uptime, failure_count):
+        """JIT-compiled variant of _compute_weights_numpy"""
+        weights = np.empty_like(speed)
+        for i in prange(weights.shape[0]):
+            weight = 1.0
+            if speed[i] != 0:
+                weight *= speed[i] / 1000.0
+            if uptime[i] != 0:
+                weight *= uptime[i] / 100.0
+            weights[i] = weight * max(0.1, 1.0 - failure_count[i] * 0.3)
+        return weights
+else:
+    _compute_weights_jit = _compute_weights_numpy
+
 
 @dataclass
 class Proxy:
@@ -155,6 +205,11 @@ class ProxyManager:
         self.proxies: List[Proxy] = []
         self.current_index = 0
         self.stats = ProxyStats()
+        self._rng = np.random.default_rng()
+        # Normalized weights of the active proxies, in pool order, with the
+        # _weights_version they were computed at; bumped by _invalidate_weights
+        self._weights: Optional[Tuple[int, np.ndarray]] = None
+        self._weights_version = 0
         
         # Thread safety
         self._lock = threading.Lock()
@@ -221,13 +276,8 @@ class ProxyManager:
         if not proxy_list:
             return
         
-        # Split by common delimiters
-        for delimiter in [',', ';', '\n']:
-            if delimiter in proxy_list:
-                proxy_urls = proxy_list.split(delimiter)
-                break
-        else:
-            proxy_urls = [proxy_list]
+        # Split by common delimiters (mixed delimiters are allowed)
+        proxy_urls = _ENV_SPLIT_RE.split(proxy_list)
         
         for proxy_url in proxy_urls:
             proxy_url = proxy_url.strip()
@@ -312,33 +362,47 @@ class ProxyManager:
         if not active_proxies:
             return None
         
-        # Calculate weights based on speed and uptime
-        weights = []
-        for proxy in active_proxies:
-            weight = 1.0
-            
-            # Factor in speed (higher speed = higher weight)
-            if proxy.speed:
-                weight *= (proxy.speed / 1000)  # Normalize speed
-            
-            # Factor in uptime (higher uptime = higher weight)
-            if proxy.uptime:
-                weight *= (proxy.uptime / 100)  # Normalize uptime
-            
-            # Factor in failure count (fewer failures = higher weight)
-            weight *= max(0.1, 1.0 - (proxy.failure_count * 0.3))
-            
-            weights.append(weight)
+        cached = self._weights
+        if cached is not None and cached[0] == self._weights_version:
+            weights = cached[1]
+        else:
+            weights = self._compute_weights(active_proxies)
+            self._weights = (self._weights_version, weights)
         
+        # Choose based on weights
+        return active_proxies[self._rng.choice(len(active_proxies), p=weights)]
+    
+    def _compute_weights(self, active_proxies: List[Proxy]) -> np.ndarray:
+        """Compute the normalized pick weights of the active proxies"""
+        # Calculate weights based on speed, uptime and failure count
+        count = len(active_proxies)
+        speed = np.fromiter((p.speed or 0.0 for p in active_proxies), dtype=np.float64, count=count)
+        uptime = np.fromiter((p.uptime or 0.0 for p in active_proxies), dtype=np.float64, count=count)
+        failure_count = np.fromiter((p.failure_count for p in active_proxies), dtype=np.float64, count=count)
+
+        if count >= NUMBA_MIN_POOL_SIZE:
+            weights = _compute_weights_jit(speed, uptime, failure_count)
+        else:
+            weights = _compute_weights_numpy(speed, uptime, failure_count)
+
         # Normalize weights
-        total_weight = sum(weights)
+        total_weight = weights.sum()
         if total_weight > 0:
-            weights = [w / total_weight for w in weights]
+            weights /= total_weight
         else:
-            weights = [1.0 / len(active_proxies)] * len(active_proxies)
+            weights = np.full(len(active_proxies), 1.0 / len(active_proxies))
         
-        # Choose based on weights
-        return random.choices(active_proxies, weights=weights)[0]
+        return weights
+    
+    def _invalidate_weights(self):
+        """
+        Mark the cached weights stale, to be called under the lock
+        
+        Needed whenever an input of the weights changes: the active set,
+        or an active proxy's speed, uptime or failure count. Proxies changed
+        directly, bypassing the manager, are not noticed.
+        """
+        self._weights_version += 1
     
     def mark_proxy_failure(self, proxy: Proxy):
         """Mark a proxy as failed"""
@@ -346,12 +410,18 @@ class ProxyManager:
             return
         
         with self._lock:
+            was_active = proxy.is_active
             proxy.mark_failure()
+            # An inactive proxy carries no weight, so only an active one's
+            # failure count (or deactivation) changes the weights
+            if was_active:
+                self._invalidate_weights()
             self.stats.failed_requests += 1
             
-            # Update stats
-            self.stats.active_proxies = len([p for p in self.proxies if p.is_active])
-            self.stats.failed_proxies = len([p for p in self.proxies if not p.is_active])
+            # Update stats only when the proxy gets deactivated
+            if was_active and not proxy.is_active:
+                self.stats.active_proxies -= 1
+                self.stats.failed_proxies += 1
     
     def mark_proxy_success(self, proxy: Proxy):
         """Mark a proxy as successful"""
@@ -359,8 +429,17 @@ class ProxyManager:
             return
         
         with self._lock:
+            was_inactive = not proxy.is_active
+            # A success on a healthy proxy, the common case, leaves the weights as they are
+            if was_inactive or proxy.failure_count:
+                self._invalidate_weights()
             proxy.reset_failures()
             self.stats.successful_requests += 1
+            
+            # Update stats only when the proxy gets reactivated
+            if was_inactive:
+                self.stats.active_proxies += 1
+                self.stats.failed_proxies -= 1
     
     async def validate_proxy(self, proxy: Proxy) -> bool:
         """
@@ -431,7 +510,48 @@ class ProxyManager:
         
         logger.info(f"Validated {len(self.proxies)} proxies: {sum(results.values())} working")
         return results
-    
+
+    async def validate_until(self, needed: int) -> List[Proxy]:
+        """
+        Validate proxies concurrently until enough working ones are found
+
+        Pending validations are cancelled as soon as ``needed`` proxies
+        have passed, so the call does not wait for the slowest proxies.
+
+        Args:
+            needed: Number of working proxies to find
+
+        Returns:
+            List of working proxies (may be shorter than ``needed``)
+        """
+        if not self.enabled or not self.proxies or needed <= 0:
+            return []
+
+        async def validate(proxy: Proxy):
+            return proxy, await self._validate_proxy_with_result(proxy)
+
+        tasks = [asyncio.create_task(validate(proxy)) for proxy in list(self.proxies)]
+        working = []
+
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                proxy, result = await next_done
+                if result:
+                    self.mark_proxy_success(proxy)
+                    working.append(proxy)
+                    if len(working) >= needed:
+                        break
+                else:
+                    self.mark_proxy_failure(proxy)
+        finally:
+            # Cancel validations that are still pending
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+        logger.info(f"Found {len(working)} working proxies (needed {needed})")
+        return working
+
     async def _validate_proxy_with_result(self, proxy: Proxy) -> bool:
         """Validate proxy and return result"""
         try:
@@ -471,6 +591,8 @@ class ProxyManager:
             # Calculate response time
             response_time = (time.time() - start_time) * 1000  # in milliseconds
             proxy.speed = response_time
+            with self._lock:
+                self._invalidate_weights()
 
             if response.status_code == 200:
                 logger.debug(f"Proxy {proxy.url} validation successful ({response_time:.0f}ms)")
@@ -501,6 +623,7 @@ class ProxyManager:
             proxy = Proxy(url=proxy_url, **kwargs)
             with self._lock:
                 self.proxies.append(proxy)
+                self._invalidate_weights()
                 self.stats.total_proxies += 1
                 self.stats.active_proxies += 1
             
@@ -528,6 +651,7 @@ class ProxyManager:
             for i, proxy in enumerate(self.proxies):
                 if proxy.url == proxy_url:
                     removed_proxy = self.proxies.pop(i)
+                    self._invalidate_weights()
                     self.stats.total_proxies -= 1
                     if removed_proxy.is_active:
                         self.stats.active_proxies -= 1
@@ -1,4 +1,3 @@
-from sqlalchemy import create_engine
 """
 Task Scheduler for Professional Web Scraper
 
@@ -6,30 +5,90 @@ Implements comprehensive task scheduling with notifications, job management,
 monitoring, and persistence capabilities.
 """
 
+import os
+import sys
 import logging
+import asyncio
 import json
 import time
-from typing import Dict, List, Any, Optional, Union, Callable
+import operator
+from typing import Dict, Iterator, List, Set, Tuple, Any, Optional, Union, Callable
 from dataclasses import dataclass, field
 from datetime import datetime, timedelta
 import threading
+import queue
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 import sqlite3
+from apscheduler.schedulers.base import BaseScheduler
 from apscheduler.schedulers.background import BackgroundScheduler
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.cron import CronTrigger
 from apscheduler.triggers.interval import IntervalTrigger
 from apscheduler.triggers.date import DateTrigger
-from apscheduler.jobstores.sqlalchemy import SQLAlchemyJobStore
+from apscheduler.jobstores.memory import MemoryJobStore
 from apscheduler.executors.pool import ThreadPoolExecutor
+from apscheduler.executors.asyncio import AsyncIOExecutor
 import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
 
 logger = logging.getLogger(__name__)
 
+# Applied to every scheduler database connection. WAL is persistent on the
+# database file; the remaining settings are per-connection. auto_vacuum must
+# come first: it only applies to new databases, before WAL is enabled.
+SQLITE_PRAGMAS = (
+    'auto_vacuum=INCREMENTAL',
+    'journal_mode=WAL',
+    'synchronous=NORMAL',
+    'temp_store=MEMORY',
+    'mmap_size=268435456',
+    'cache_size=-20000',
+    'busy_timeout=5000',
+)
+
+# Rows deleted per statement by the cleanup task, so the write lock is
+# released between chunks instead of being held for the whole purge
+CLEANUP_BATCH_SIZE = 1000
+
+# dataclass(slots=True) is only available on Python 3.10+
+_DATACLASS_SLOTS = {'slots': True} if sys.version_info >= (3, 10) else {}
+
+# Fetches the TaskResult fields stored in task_results in a single call
+_RESULT_FIELDS = operator.attrgetter(
+    'task_id', 'success', 'start_time', 'end_time', 'duration', 'result', 'error', 'logs'
+)
+
+# JSON helpers for database columns, backed by orjson when available.
+# Task results and logs hold arbitrary values: whatever JSON can't represent
+# (sets, custom objects) is stored as its str() rather than losing the row
+if ORJSON_AVAILABLE:
+    def _json_dumps(obj: Any) -> str:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS).decode()
+    
+    def _json_dumps_result(obj: Any) -> str:
+        return orjson.dumps(obj, default=str, option=orjson.OPT_NON_STR_KEYS).decode()
+    
+    _json_loads = orjson.loads
+else:
+    _json_dumps = json.dumps
+    _json_loads = json.loads
+    
+    def _json_dumps_result(obj: Any) -> str:
+        return json.dumps(obj, default=str)
 
-@dataclass
+
+@dataclass(**_DATACLASS_SLOTS)
 class ScheduledTask:
     """Represents a scheduled task"""
     id: str
@@ -50,7 +109,7 @@ class ScheduledTask:
     failure_count: int = 0
 
 
-@dataclass
+@dataclass(**_DATACLASS_SLOTS)
 class TaskResult:
     """Result of a task execution"""
     task_id: str
@@ -63,7 +122,7 @@ class TaskResult:
     logs: List[str] = field(default_factory=list)
 
 
-@dataclass
+@dataclass(**_DATACLASS_SLOTS)
 class NotificationConfig:
     """Configuration for notifications"""
     email: Dict[str, Any] = field(default_factory=dict)
@@ -77,6 +136,13 @@ class TaskScheduler:
     Comprehensive task scheduler with notifications and monitoring
     """
     
+    # Trigger classes by trigger_type; extend to support custom triggers
+    TRIGGER_TYPES = {
+        'interval': IntervalTrigger,
+        'cron': CronTrigger,
+        'date': DateTrigger,
+    }
+    
     def __init__(self, config_manager=None):
         """
         Initialize task scheduler
@@ -96,6 +162,8 @@ class TaskScheduler:
         
         # Configuration
         self.max_workers = scheduler_config.get('max_workers', 10)
+        self.use_asyncio = scheduler_config.get('use_asyncio', False)
+        self.process_workers = scheduler_config.get('process_workers', os.cpu_count())
         self.job_defaults = scheduler_config.get('job_defaults', {
             'coalesce': True,
             'max_instances': 1,
@@ -104,41 +172,90 @@ class TaskScheduler:
         
         # Database configuration
         self.database_path = scheduler_config.get('database_path', 'scheduler.db')
+        self.result_batch_size = scheduler_config.get('result_batch_size', 64)
+        self.result_retention_days = scheduler_config.get('result_retention_days', 30)
         
         # Notification configuration
         self.notification_config = NotificationConfig(**scheduler_config.get('notifications', {}))
+        self._notifications_enabled = any(
+            self._is_channel_enabled(channel)
+            for channel in (
+                self.notification_config.email,
+                self.notification_config.webhook,
+                self.notification_config.slack,
+                self.notification_config.telegram,
+            )
+        )
         
         # Initialize scheduler
         self.scheduler = self._initialize_scheduler()
         
-        # Task registry
-        self.registered_tasks: Dict[str, Callable] = {}
+        # Task registry: task_id -> (function, cached task settings)
+        self.registered_tasks: Dict[str, Tuple[Callable, Dict[str, Any]]] = {}
+        
+        # CPU-bound tasks run their function in a process pool (created lazily)
+        self._cpu_tasks: Set[str] = set()
+        self._process_pool: Optional[ProcessPoolExecutor] = None
+        self._process_pool_lock = threading.Lock()
+        
+        # Running totals for _collect_metrics, updated as tasks complete
+        self._metrics = {'total_runs': 0, 'total_success': 0, 'total_failures': 0}
+        self._metrics_lock = threading.Lock()
+        self._paused_tasks: Set[str] = set()
+        
+        # Pooled database connections (one per thread)
+        self._conn_local = threading.local()
         
-        # Task results storage
-        self.task_results: List[TaskResult] = []
+        # Notifications are sent by a dedicated thread, off the task workers
+        self._notify_queue: queue.Queue = queue.Queue()
+        self._notify_thread: Optional[threading.Thread] = None
+        self._smtp: Optional[smtplib.SMTP] = None
         
-        # Thread safety
-        self._lock = threading.Lock()
+        # Keep-alive HTTP session shared by webhook/Slack/Telegram notifications
+        self._http = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=16,
+            pool_maxsize=16,
+            max_retries=Retry(total=2, backoff_factor=0.3)
+        )
+        self._http.mount('https://', adapter)
+        self._http.mount('http://', adapter)
+        
+        # Result rows are written in batches by a single writer thread
+        self._record_queue: queue.Queue = queue.Queue()
+        self._writer_thread: Optional[threading.Thread] = None
         
         # Initialize database
         self._init_database()
+        self._load_metrics()
         
         # Register default tasks
         self._register_default_tasks()
         
         logger.info("Task scheduler initialized")
     
-    def _initialize_scheduler(self) -> BackgroundScheduler:
+    def _initialize_scheduler(self) -> BaseScheduler:
         """Initialize APScheduler with configuration"""
+        # Jobs are registered in-process by register_task(), so they don't
+        # need to be persisted; task state lives in the task_configs table
         jobstores = {
-            'default': SQLAlchemyJobStore(url=f'sqlite:///{self.database_path}')
+            'default': MemoryJobStore()
         }
         
-        executors = {
-            'default': ThreadPoolExecutor(max_workers=self.max_workers)
-        }
+        if self.use_asyncio:
+            # Jobs run on the caller's event loop; start() must be called
+            # from a running loop
+            executors = {
+                'default': AsyncIOExecutor()
+            }
+            scheduler_class = AsyncIOScheduler
+        else:
+            executors = {
+                'default': ThreadPoolExecutor(max_workers=self.max_workers)
+            }
+            scheduler_class = BackgroundScheduler
         
-        scheduler = BackgroundScheduler(
+        scheduler = scheduler_class(
             jobstores=jobstores,
             executors=executors,
             job_defaults=self.job_defaults,
@@ -147,18 +264,29 @@ class TaskScheduler:
         
         return scheduler
     
+    def _get_connection(self) -> sqlite3.Connection:
+        """Get the pooled database connection for the calling thread"""
+        conn = getattr(self._conn_local, 'conn', None)
+        if conn is None:
+            # Autocommit mode; multi-statement writes use explicit transactions
+            conn = sqlite3.connect(self.database_path, check_same_thread=False, isolation_level=None)
+            cursor = conn.cursor()
+            for pragma in SQLITE_PRAGMAS:
+                cursor.execute(f'PRAGMA {pragma}')
+            self._conn_local.conn = conn
+        return conn
+    
     def _init_database(self):
         """Initialize SQLite database for task results"""
         try:
-            conn = sqlite3.connect(self.database_path)
-            cursor = conn.cursor()
+            cursor = self._get_connection().cursor()
             
             # Create task results table
             cursor.execute('''
                 CREATE TABLE IF NOT EXISTS task_results (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
                     task_id TEXT NOT NULL,
-                    success BOOLEAN NOT NULL,
+                    success INTEGER NOT NULL,
                     start_time TEXT NOT NULL,
                     end_time TEXT NOT NULL,
                     duration REAL NOT NULL,
@@ -179,7 +307,7 @@ class TaskScheduler:
                     kwargs TEXT NOT NULL,
                     trigger_type TEXT NOT NULL,
                     trigger_config TEXT NOT NULL,
-                    enabled BOOLEAN NOT NULL,
+                    enabled INTEGER NOT NULL,
                     description TEXT,
                     notifications TEXT,
                     created_at TEXT NOT NULL,
@@ -191,23 +319,47 @@ class TaskScheduler:
                 )
             ''')
             
-            # Create indexes
-            cursor.execute('CREATE INDEX IF NOT EXISTS idx_task_results_task_id ON task_results(task_id)')
+            # Create indexes. (task_id, start_time) serves per-task result
+            # lookups without a sort and supersedes the old task_id index.
+            cursor.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = 'idx_task_results_task_start'"
+            )
+            new_results_index = cursor.fetchone() is None
+            cursor.execute('DROP INDEX IF EXISTS idx_task_results_task_id')
+            cursor.execute(
+                'CREATE INDEX IF NOT EXISTS idx_task_results_task_start ON task_results(task_id, start_time DESC)'
+            )
             cursor.execute('CREATE INDEX IF NOT EXISTS idx_task_results_start_time ON task_results(start_time)')
             cursor.execute('CREATE INDEX IF NOT EXISTS idx_task_configs_enabled ON task_configs(enabled)')
             
-            conn.commit()
-            conn.close()
+            # Give the planner statistics for the new index
+            if new_results_index:
+                cursor.execute('ANALYZE task_results')
             
         except Exception as e:
             logger.error(f"Failed to initialize scheduler database: {e}")
     
+    def _load_metrics(self):
+        """Seed the running metric totals from the stored task counters"""
+        try:
+            cursor = self._get_connection().cursor()
+            cursor.execute('''
+                SELECT COALESCE(SUM(run_count), 0), COALESCE(SUM(success_count), 0),
+                       COALESCE(SUM(failure_count), 0)
+                FROM task_configs
+            ''')
+            runs, successes, failures = cursor.fetchone()
+            self._metrics.update(total_runs=runs, total_success=successes, total_failures=failures)
+            
+        except Exception as e:
+            logger.error(f"Error loading scheduler metrics: {e}")
+    
     def _register_default_tasks(self):
         """Register default system tasks"""
         # Data cleanup task
         self.register_task(
             'data_cleanup',
-            self._cleanup_old_data_wrapper,
+            self._cleanup_old_data,
             trigger_type='cron',
             trigger_config={'hour': 2, 'minute': 0},  # Daily at 2 AM
             description="Clean up old data and logs",
@@ -217,7 +369,7 @@ class TaskScheduler:
         # Health check task
         self.register_task(
             'health_check',
-            self._health_check_wrapper,
+            self._health_check,
             trigger_type='interval',
             trigger_config={'minutes': 30},  # Every 30 minutes
             description="System health check",
@@ -227,7 +379,7 @@ class TaskScheduler:
         # Metrics collection task
         self.register_task(
             'collect_metrics',
-            self._collect_metrics_wrapper,
+            self._collect_metrics,
             trigger_type='interval',
             trigger_config={'minutes': 15},  # Every 15 minutes
             description="Collect system metrics",
@@ -241,6 +393,23 @@ class TaskScheduler:
         
         try:
             self.scheduler.start()
+            
+            if not self._writer_thread or not self._writer_thread.is_alive():
+                self._writer_thread = threading.Thread(
+                    target=self._writer_loop,
+                    name='scheduler-writer',
+                    daemon=True
+                )
+                self._writer_thread.start()
+            
+            if not self._notify_thread or not self._notify_thread.is_alive():
+                self._notify_thread = threading.Thread(
+                    target=self._notify_loop,
+                    name='scheduler-notifier',
+                    daemon=True
+                )
+                self._notify_thread.start()
+            
             logger.info("Task scheduler started")
         except Exception as e:
             logger.error(f"Error starting scheduler: {e}")
@@ -252,13 +421,30 @@ class TaskScheduler:
         
         try:
             self.scheduler.shutdown()
+            
+            # Let the writer store pending results, then stop it
+            if self._writer_thread and self._writer_thread.is_alive():
+                self._record_queue.put(None)
+                self._writer_thread.join(timeout=30)
+            self._flush_buffers()
+            
+            if self._process_pool:
+                self._process_pool.shutdown()
+                self._process_pool = None
+            
+            # Let the notifier drain pending notifications, then stop it
+            if self._notify_thread and self._notify_thread.is_alive():
+                self._notify_queue.put(None)
+                self._notify_thread.join(timeout=30)
+            self._http.close()
+            
             logger.info("Task scheduler stopped")
         except Exception as e:
             logger.error(f"Error stopping scheduler: {e}")
     
     def register_task(self, task_id: str, function: Callable, trigger_type: str = "interval",
                      trigger_config: Dict[str, Any] = None, description: str = "",
-                     notifications: Dict[str, Any] = None) -> bool:
+                     notifications: Dict[str, Any] = None, executor: str = "default") -> bool:
         """
         Register a new task
         
@@ -269,6 +455,8 @@ class TaskScheduler:
             trigger_config: Trigger configuration
             description: Task description
             notifications: Notification configuration
+            executor: Where the function runs: 'default' (worker thread) or
+                'cpu' (process pool; the function must be picklable)
             
         Returns:
             True if registered successfully
@@ -277,23 +465,25 @@ class TaskScheduler:
             return False
         
         try:
-            # Create a wrapper function that doesn't contain references to self
-            def task_wrapper():
-                try:
-                    return function()
-                except Exception as e:
-                    logger.error(f"Error in task {task_id}: {e}")
-                    return None
-            
-            # Store function reference
-            self.registered_tasks[task_id] = task_wrapper
+            if executor not in ("default", "cpu"):
+                raise ValueError(f"Unknown executor: {executor}")
+            
+            # Store function reference and the settings needed at run time
+            self.registered_tasks[task_id] = (function, {
+                'description': description,
+                'notifications': notifications or {}
+            })
+            if executor == "cpu":
+                self._cpu_tasks.add(task_id)
+            else:
+                self._cpu_tasks.discard(task_id)
             
             # Create trigger
             trigger = self._create_trigger(trigger_type, trigger_config or {})
             
-            # Add job to scheduler with the wrapper
+            # Add job to scheduler
             job = self.scheduler.add_job(
-                func=self._execute_task,
+                func=self._execute_task_async if self.use_asyncio else self._execute_task,
                 trigger=trigger,
                 args=[task_id],
                 id=task_id,
@@ -314,6 +504,9 @@ class TaskScheduler:
             )
             
             self._store_task_config(task)
+            # Re-registering stores the task as enabled and the job is live again
+            if task.enabled:
+                self._paused_tasks.discard(task_id)
             
             logger.info(f"Task registered: {task_id}")
             return True
@@ -324,201 +517,252 @@ class TaskScheduler:
     
     def _create_trigger(self, trigger_type: str, config: Dict[str, Any]):
         """Create APScheduler trigger"""
-        if trigger_type == "interval":
-            return IntervalTrigger(**config)
-        elif trigger_type == "cron":
-            return CronTrigger(**config)
-        elif trigger_type == "date":
-            return DateTrigger(**config)
-        else:
+        trigger_class = self.TRIGGER_TYPES.get(trigger_type)
+        if trigger_class is None:
             raise ValueError(f"Unknown trigger type: {trigger_type}")
+        return trigger_class(**config)
+    
+    def _get_process_pool(self) -> ProcessPoolExecutor:
+        """Get the process pool used by CPU-bound tasks"""
+        with self._process_pool_lock:
+            if self._process_pool is None:
+                self._process_pool = ProcessPoolExecutor(max_workers=self.process_workers)
+            return self._process_pool
     
     def _execute_task(self, task_id: str):
         """Execute a scheduled task"""
+        # Wall clock only for the stored timestamps; durations use perf_counter
         start_time = datetime.now()
+        started = time.perf_counter()
         logs = []
         
         try:
-            # Get task function
-            if task_id not in self.registered_tasks:
-                raise ValueError(f"Task {task_id} not found")
-            
-            function = self.registered_tasks[task_id]
+            function = self._get_task_function(task_id)
             
             # Execute function
             logs.append(f"Starting task {task_id}")
-            result = function()
+            if task_id in self._cpu_tasks:
+                result = self._get_process_pool().submit(function).result()
+            elif asyncio.iscoroutinefunction(function):
+                result = asyncio.run(function())
+            else:
+                result = function()
+            
+            self._complete_task(task_id, start_time, started, logs, result=result)
+            
+        except Exception as e:
+            self._complete_task(task_id, start_time, started, logs, error=e)
+    
+    async def _execute_task_async(self, task_id: str):
+        """Execute a scheduled task on the asyncio scheduler's event loop"""
+        start_time = datetime.now()
+        started = time.perf_counter()
+        logs = []
+        
+        try:
+            function = self._get_task_function(task_id)
+            
+            # Await coroutine tasks directly; run blocking ones off the loop
+            logs.append(f"Starting task {task_id}")
+            if asyncio.iscoroutinefunction(function) and task_id not in self._cpu_tasks:
+                result = await function()
+            else:
+                pool = self._get_process_pool() if task_id in self._cpu_tasks else None
+                result = await asyncio.get_running_loop().run_in_executor(pool, function)
+            
+            self._complete_task(task_id, start_time, started, logs, result=result)
+            
+        except Exception as e:
+            self._complete_task(task_id, start_time, started, logs, error=e)
+    
+    def _get_task_function(self, task_id: str) -> Callable:
+        """Get the registered function of a task"""
+        if task_id not in self.registered_tasks:
+            raise ValueError(f"Task {task_id} not found")
+        
+        return self.registered_tasks[task_id][0]
+    
+    def _complete_task(self, task_id: str, start_time: datetime, started: float,
+                       logs: List[str], result: Any = None, error: Optional[Exception] = None):
+        """Build the task result, then queue its notification and storage"""
+        duration = time.perf_counter() - started
+        
+        if error is None:
             logs.append(f"Task {task_id} completed successfully")
             
             # Create success result
-            end_time = datetime.now()
             task_result = TaskResult(
                 task_id=task_id,
                 success=True,
                 start_time=start_time,
-                end_time=end_time,
-                duration=(end_time - start_time).total_seconds(),
+                end_time=start_time + timedelta(seconds=duration),
+                duration=duration,
                 result=result,
                 logs=logs
             )
-            
-            # Update task statistics (using a separate method to avoid serialization issues)
-            self._update_task_stats_safe(task_id, True)
-            
-            # Send success notification if configured
-            self._send_notification_safe(task_id, task_result)
-            
-        except Exception as e:
+        else:
             # Create failure result
-            end_time = datetime.now()
-            error_msg = str(e)
+            error_msg = str(error)
             logs.append(f"Task {task_id} failed: {error_msg}")
             
             task_result = TaskResult(
                 task_id=task_id,
                 success=False,
                 start_time=start_time,
-                end_time=end_time,
-                duration=(end_time - start_time).total_seconds(),
+                end_time=start_time + timedelta(seconds=duration),
+                duration=duration,
                 error=error_msg,
                 logs=logs
             )
             
-            # Update task statistics
-            self._update_task_stats_safe(task_id, False)
-            
-            # Send failure notification
+            logger.error(f"Task {task_id} failed: {error}")
+        
+        with self._metrics_lock:
+            self._metrics['total_runs'] += 1
+            if error is None:
+                self._metrics['total_success'] += 1
+            else:
+                self._metrics['total_failures'] += 1
+        
+        # Hand off to the notifier and writer threads; no IO on this thread
+        if self._notifications_enabled:
             self._send_notification_safe(task_id, task_result)
-            
-            logger.error(f"Task {task_id} failed: {e}")
+        self._record_execution(task_result)
+    
+    def _send_notification_safe(self, task_id: str, result: TaskResult):
+        """Queue a notification for the notifier thread (safe version for scheduler)"""
+        self._notify_queue.put((task_id, result))
+    
+    def _notify_loop(self):
+        """Send queued notifications until a None sentinel is received"""
+        while True:
+            item = self._notify_queue.get()
+            if item is None:
+                break
+            
+            task_id, result = item
+            self._send_notification(task_id, result)
         
-        # Store result
-        self._store_task_result_safe(task_result)
+        self._close_smtp_connection()
     
-    def _update_task_stats(self, task_id: str, success: bool):
-        """Update task statistics"""
-        try:
-            conn = sqlite3.connect(self.database_path)
-            cursor = conn.cursor()
-            
-            if success:
-                cursor.execute('''
-                    UPDATE task_configs 
-                    SET run_count = run_count + 1, 
-                        success_count = success_count + 1,
-                        last_run = ?
-                    WHERE id = ?
-                ''', (datetime.now().isoformat(), task_id))
-            else:
-                cursor.execute('''
-                    UPDATE task_configs 
-                    SET run_count = run_count + 1, 
-                        failure_count = failure_count + 1,
-                        last_run = ?
-                    WHERE id = ?
-                ''', (datetime.now().isoformat(), task_id))
-            
-            conn.commit()
-            conn.close()
-            
-        except Exception as e:
-            logger.error(f"Error updating task stats: {e}")
-
-    def _update_task_stats_safe(self, task_id: str, success: bool):
-        """Update task statistics (safe version for scheduler)"""
-        try:
-            conn = sqlite3.connect(self.database_path)
-            cursor = conn.cursor()
-            
-            if success:
-                cursor.execute('''
-                    UPDATE task_configs 
-                    SET run_count = run_count + 1, 
-                        success_count = success_count + 1,
-                        last_run = ?
-                    WHERE id = ?
-                ''', (datetime.now().isoformat(), task_id))
+    def _record_execution(self, result: TaskResult):
+        """Queue a task result for the writer thread, which serializes and stores it"""
+        self._record_queue.put(result)
+    
+    @staticmethod
+    def _result_row(result: TaskResult) -> tuple:
+        """Serialize a task result into a task_results row"""
+        task_id, success, start_time, end_time, duration, value, error, logs = _RESULT_FIELDS(result)
+        end_time = end_time.isoformat()
+        return (
+            task_id,
+            success,
+            start_time.isoformat(),
+            end_time,
+            duration,
+            _json_dumps_result(value) if value else None,
+            error,
+            _json_dumps_result(logs),
+            end_time
+        )
+    
+    def _store_results(self, results: List[TaskResult]):
+        """Serialize a batch of task results and write them in one transaction"""
+        # Coalesce counters per task: [runs, successes, failures, last_run].
+        # Taken from the results themselves, so a row that fails to serialize
+        # still counts as a run
+        stats: Dict[str, List[Any]] = {}
+        rows = []
+        for result in results:
+            task_stats = stats.setdefault(result.task_id, [0, 0, 0, None])
+            task_stats[0] += 1
+            if result.success:
+                task_stats[1] += 1
             else:
-                cursor.execute('''
-                    UPDATE task_configs 
-                    SET run_count = run_count + 1, 
-                        failure_count = failure_count + 1,
-                        last_run = ?
-                    WHERE id = ?
-                ''', (datetime.now().isoformat(), task_id))
+                task_stats[2] += 1
+            task_stats[3] = result.end_time.isoformat()
             
-            conn.commit()
-            conn.close()
+            try:
+                rows.append(self._result_row(result))
+            except Exception as e:
+                logger.error(f"Error recording execution of task {result.task_id}: {e}")
+        
+        self._write_rows(rows, stats)
+    
+    def _writer_loop(self):
+        """Write queued task results in batches until a None sentinel is received"""
+        while True:
+            # Block for the first result, then take whatever else is already queued
+            items = [self._record_queue.get()]
+            while len(items) < self.result_batch_size:
+                try:
+                    items.append(self._record_queue.get_nowait())
+                except queue.Empty:
+                    break
             
-        except Exception as e:
-            logger.error(f"Error updating task stats for {task_id}: {e}")
-
-    def _send_notification_safe(self, task_id: str, result: TaskResult):
-        """Send notification (safe version for scheduler)"""
-        try:
-            # Get task configuration
-            task_config = self._get_task_config(task_id)
-            if not task_config:
-                return
+            results = [item for item in items if item is not None]
+            if results:
+                self._store_results(results)
             
-            notifications = task_config.get('notifications', {})
-            if not notifications:
-                return
+            for _ in items:
+                self._record_queue.task_done()
             
-            # Send notifications based on result
-            if result.success and notifications.get('on_success'):
-                self._send_email_notification_safe(task_id, result)
-            elif not result.success and notifications.get('on_failure'):
-                self._send_email_notification_safe(task_id, result)
-                
-        except Exception as e:
-            logger.error(f"Error sending notification for {task_id}: {e}")
-
-    def _send_email_notification_safe(self, task_id: str, result: TaskResult):
-        """Send email notification (safe version)"""
-        try:
-            # This is a simplified version that doesn't use instance methods
-            logger.info(f"Email notification would be sent for task {task_id}: {'Success' if result.success else 'Failure'}")
-        except Exception as e:
-            logger.error(f"Error sending email notification: {e}")
-
-    def _store_task_result_safe(self, result: TaskResult):
-        """Store task result (safe version for scheduler)"""
+            if len(results) != len(items):
+                break
+    
+    def _flush_buffers(self):
+        """Wait until every queued result row has been written"""
+        if self._writer_thread and self._writer_thread.is_alive():
+            self._record_queue.join()
+            return
+        
+        # No writer running (not started yet or stopped): write in this thread
+        results = []
+        while True:
+            try:
+                item = self._record_queue.get_nowait()
+            except queue.Empty:
+                break
+            self._record_queue.task_done()
+            if item is not None:
+                results.append(item)
+        
+        if results:
+            self._store_results(results)
+    
+    def _write_rows(self, rows: List[tuple], stats: Dict[str, List[Any]]):
+        """Insert result rows and apply the coalesced task stats in a single transaction"""
+        cursor = self._get_connection().cursor()
         try:
-            conn = sqlite3.connect(self.database_path)
-            cursor = conn.cursor()
-            
-            cursor.execute('''
+            cursor.execute('BEGIN IMMEDIATE')
+            cursor.executemany('''
                 INSERT INTO task_results 
                 (task_id, success, start_time, end_time, duration, result, error, logs, created_at)
                 VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                result.task_id,
-                result.success,
-                result.start_time.isoformat(),
-                result.end_time.isoformat(),
-                result.duration,
-                json.dumps(result.result) if result.result else None,
-                result.error,
-                json.dumps(result.logs),
-                datetime.now().isoformat()
-            ))
-            
-            conn.commit()
-            conn.close()
-            
+            ''', rows)
+            cursor.executemany('''
+                UPDATE task_configs 
+                SET run_count = run_count + ?, 
+                    success_count = success_count + ?,
+                    failure_count = failure_count + ?,
+                    last_run = ?
+                WHERE id = ?
+            ''', [(runs, successes, failures, last_run, task_id)
+                  for task_id, (runs, successes, failures, last_run) in stats.items()])
+            cursor.execute('COMMIT')
         except Exception as e:
-            logger.error(f"Error storing task result: {e}")
+            if cursor.connection.in_transaction:
+                cursor.execute('ROLLBACK')
+            logger.error(f"Error recording {sum(s[0] for s in stats.values())} task results: {e}")
     
     def _send_notification(self, task_id: str, result: TaskResult):
         """Send notification for task result"""
         try:
-            # Get task configuration
-            task_config = self._get_task_config(task_id)
-            if not task_config:
-                return
-            
-            notifications = task_config.get('notifications', {})
+            # Get notification settings (cached at registration time)
+            if task_id in self.registered_tasks:
+                notifications = self.registered_tasks[task_id][1]['notifications']
+            else:
+                notifications = self._get_task_notifications(task_id)
             
             # Check if notification should be sent
             should_notify = False
@@ -531,21 +775,49 @@ class TaskScheduler:
                 return
             
             # Send notifications
-            if self.notification_config.email:
+            if self._is_channel_enabled(self.notification_config.email):
                 self._send_email_notification(task_id, result)
             
-            if self.notification_config.webhook:
+            if self._is_channel_enabled(self.notification_config.webhook):
                 self._send_webhook_notification(task_id, result)
             
-            if self.notification_config.slack:
+            if self._is_channel_enabled(self.notification_config.slack):
                 self._send_slack_notification(task_id, result)
             
-            if self.notification_config.telegram:
+            if self._is_channel_enabled(self.notification_config.telegram):
                 self._send_telegram_notification(task_id, result)
                 
         except Exception as e:
             logger.error(f"Error sending notification: {e}")
     
+    @staticmethod
+    def _is_channel_enabled(channel_config: Dict[str, Any]) -> bool:
+        """Check whether a notification channel is configured and enabled"""
+        return bool(channel_config) and channel_config.get('enabled', True)
+    
+    def _get_smtp_connection(self, email_config: Dict[str, Any]) -> smtplib.SMTP:
+        """Get the notifier's SMTP connection, connecting if needed"""
+        if self._smtp is None:
+            server = smtplib.SMTP(email_config['smtp_server'], email_config['smtp_port'])
+            if email_config.get('use_tls', True):
+                server.starttls()
+            
+            if email_config.get('username') and email_config.get('password'):
+                server.login(email_config['username'], email_config['password'])
+            
+            self._smtp = server
+        
+        return self._smtp
+    
+    def _close_smtp_connection(self):
+        """Close the notifier's SMTP connection"""
+        if self._smtp is not None:
+            try:
+                self._smtp.quit()
+            except Exception:
+                pass
+            self._smtp = None
+    
     def _send_email_notification(self, task_id: str, result: TaskResult):
         """Send email notification"""
         try:
@@ -583,16 +855,12 @@ class TaskScheduler:
             
             msg.attach(MIMEText(body, 'plain'))
             
-            # Send email
-            server = smtplib.SMTP(email_config['smtp_server'], email_config['smtp_port'])
-            if email_config.get('use_tls', True):
-                server.starttls()
-            
-            if email_config.get('username') and email_config.get('password'):
-                server.login(email_config['username'], email_config['password'])
-            
-            server.send_message(msg)
-            server.quit()
+            # Send email, reconnecting once if the server dropped the connection
+            try:
+                self._get_smtp_connection(email_config).send_message(msg)
+            except smtplib.SMTPServerDisconnected:
+                self._smtp = None
+                self._get_smtp_connection(email_config).send_message(msg)
             
             logger.info(f"Email notification sent for task {task_id}")
             
@@ -614,11 +882,11 @@ class TaskScheduler:
                 'logs': result.logs
             }
             
-            response = requests.post(
+            response = self._http.post(
                 webhook_config['url'],
                 json=payload,
                 headers=webhook_config.get('headers', {}),
-                timeout=30
+                timeout=(5, 30)
             )
             
             if response.status_code == 200:
@@ -663,10 +931,10 @@ class TaskScheduler:
                 }]
             }
             
-            response = requests.post(
+            response = self._http.post(
                 slack_config['webhook_url'],
                 json=payload,
-                timeout=30
+                timeout=(5, 30)
             )
             
             if response.status_code == 200:
@@ -693,10 +961,10 @@ class TaskScheduler:
                 'parse_mode': 'HTML'
             }
             
-            response = requests.post(
+            response = self._http.post(
                 f"https://api.telegram.org/bot{telegram_config['bot_token']}/sendMessage",
                 json=payload,
-                timeout=30
+                timeout=(5, 30)
             )
             
             if response.status_code == 200:
@@ -710,84 +978,65 @@ class TaskScheduler:
     def _store_task_config(self, task: ScheduledTask):
         """Store task configuration in database"""
         try:
-            conn = sqlite3.connect(self.database_path)
-            cursor = conn.cursor()
+            cursor = self._get_connection().cursor()
             
+            # Upsert so re-registering a task keeps its counters and created_at
             cursor.execute('''
-                INSERT OR REPLACE INTO task_configs 
+                INSERT INTO task_configs 
                 (id, name, function, args, kwargs, trigger_type, trigger_config, enabled, description, notifications, created_at)
                 VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(id) DO UPDATE SET
+                    name = excluded.name,
+                    function = excluded.function,
+                    args = excluded.args,
+                    kwargs = excluded.kwargs,
+                    trigger_type = excluded.trigger_type,
+                    trigger_config = excluded.trigger_config,
+                    enabled = excluded.enabled,
+                    description = excluded.description,
+                    notifications = excluded.notifications
             ''', (
                 task.id,
                 task.name,
                 task.function,
-                json.dumps(task.args),
-                json.dumps(task.kwargs),
+                _json_dumps(task.args),
+                _json_dumps(task.kwargs),
                 task.trigger_type,
-                json.dumps(task.trigger_config),
+                _json_dumps(task.trigger_config),
                 task.enabled,
                 task.description,
-                json.dumps(task.notifications),
+                _json_dumps(task.notifications),
                 task.created_at.isoformat()
             ))
             
-            conn.commit()
-            conn.close()
-            
         except Exception as e:
             logger.error(f"Error storing task config: {e}")
     
-    def _store_task_result(self, result: TaskResult):
-        """Store task result in database"""
-        try:
-            conn = sqlite3.connect(self.database_path)
-            cursor = conn.cursor()
-            
-            cursor.execute('''
-                INSERT INTO task_results 
-                (task_id, success, start_time, end_time, duration, result, error, logs, created_at)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                result.task_id,
-                result.success,
-                result.start_time.isoformat(),
-                result.end_time.isoformat(),
-                result.duration,
-                json.dumps(result.result) if result.result else None,
-                result.error,
-                json.dumps(result.logs),
-                datetime.now().isoformat()
-            ))
-            
-            conn.commit()
-            conn.close()
-            
-        except Exception as e:
-            logger.error(f"Error storing task result: {e}")
-    
     def _get_task_config(self, task_id: str) -> Optional[Dict[str, Any]]:
         """Get task configuration from database"""
         try:
-            conn = sqlite3.connect(self.database_path)
-            cursor = conn.cursor()
+            cursor = self._get_connection().cursor()
             
-            cursor.execute('SELECT * FROM task_configs WHERE id = ?', (task_id,))
+            cursor.execute('''
+                SELECT id, name, function, args, kwargs, trigger_type, trigger_config, enabled,
+                       description, notifications, created_at, last_run, next_run,
+                       run_count, success_count, failure_count
+                FROM task_configs WHERE id = ?
+            ''', (task_id,))
             row = cursor.fetchone()
             
-            conn.close()
-            
             if row:
                 return {
                     'id': row[0],
                     'name': row[1],
                     'function': row[2],
-                    'args': json.loads(row[3]),
-                    'kwargs': json.loads(row[4]),
+                    'args': _json_loads(row[3]),
+                    'kwargs': _json_loads(row[4]),
                     'trigger_type': row[5],
-                    'trigger_config': json.loads(row[6]),
+                    'trigger_config': _json_loads(row[6]),
                     'enabled': bool(row[7]),
                     'description': row[8],
-                    'notifications': json.loads(row[9]) if row[9] else {},
+                    'notifications': _json_loads(row[9]) if row[9] else {},
                     'created_at': row[10],
                     'last_run': row[11],
                     'next_run': row[12],
@@ -802,9 +1051,24 @@ class TaskScheduler:
             logger.error(f"Error getting task config: {e}")
             return None
     
+    def _get_task_notifications(self, task_id: str) -> Dict[str, Any]:
+        """Get only the notification settings of a task from the database"""
+        try:
+            cursor = self._get_connection().cursor()
+            cursor.execute('SELECT notifications FROM task_configs WHERE id = ? LIMIT 1', (task_id,))
+            row = cursor.fetchone()
+            
+            return _json_loads(row[0]) if row and row[0] else {}
+            
+        except Exception as e:
+            logger.error(f"Error getting task notifications: {e}")
+            return {}
+    
     def get_task_status(self, task_id: str) -> Optional[Dict[str, Any]]:
         """Get current status of a task"""
         try:
+            self._flush_buffers()
+            
             job = self.scheduler.get_job(task_id)
             if not job:
                 return None
@@ -831,25 +1095,54 @@ class TaskScheduler:
     
     def get_all_tasks(self) -> List[Dict[str, Any]]:
         """Get all registered tasks"""
-        tasks = []
-        
-        for job in self.scheduler.get_jobs():
-            status = self.get_task_status(job.id)
-            if status:
-                tasks.append(status)
-        
-        return tasks
+        try:
+            self._flush_buffers()
+            
+            # Load every task config in one query instead of one per job
+            cursor = self._get_connection().cursor()
+            cursor.execute('''
+                SELECT id, name, enabled, last_run, run_count, success_count, failure_count
+                FROM task_configs
+            ''')
+            configs = {row[0]: row for row in cursor}
+            
+            tasks = []
+            for job in self.scheduler.get_jobs():
+                config = configs.get(job.id)
+                if not config:
+                    continue
+                
+                _, name, enabled, last_run, run_count, success_count, failure_count = config
+                tasks.append({
+                    'id': job.id,
+                    'name': name,
+                    'enabled': bool(enabled),
+                    'next_run': job.next_run_time.isoformat() if job.next_run_time else None,
+                    'last_run': last_run,
+                    'run_count': run_count,
+                    'success_count': success_count,
+                    'failure_count': failure_count,
+                    'success_rate': success_count / max(run_count, 1)
+                })
+            
+            return tasks
+            
+        except Exception as e:
+            logger.error(f"Error getting all tasks: {e}")
+            return []
     
     def enable_task(self, task_id: str) -> bool:
         """Enable a task"""
         try:
+            if task_id not in self.registered_tasks:
+                logger.error(f"Task {task_id} not found")
+                return False
+            
             self.scheduler.resume_job(task_id)
+            self._paused_tasks.discard(task_id)
             
-            conn = sqlite3.connect(self.database_path)
-            cursor = conn.cursor()
+            cursor = self._get_connection().cursor()
             cursor.execute('UPDATE task_configs SET enabled = 1 WHERE id = ?', (task_id,))
-            conn.commit()
-            conn.close()
             
             logger.info(f"Task {task_id} enabled")
             return True
@@ -861,13 +1154,15 @@ class TaskScheduler:
     def disable_task(self, task_id: str) -> bool:
         """Disable a task"""
         try:
+            if task_id not in self.registered_tasks:
+                logger.error(f"Task {task_id} not found")
+                return False
+            
             self.scheduler.pause_job(task_id)
+            self._paused_tasks.add(task_id)
             
-            conn = sqlite3.connect(self.database_path)
-            cursor = conn.cursor()
+            cursor = self._get_connection().cursor()
             cursor.execute('UPDATE task_configs SET enabled = 0 WHERE id = ?', (task_id,))
-            conn.commit()
-            conn.close()
             
             logger.info(f"Task {task_id} disabled")
             return True
@@ -879,16 +1174,18 @@ class TaskScheduler:
     def remove_task(self, task_id: str) -> bool:
         """Remove a task"""
         try:
+            if task_id not in self.registered_tasks:
+                logger.error(f"Task {task_id} not found")
+                return False
+            
             self.scheduler.remove_job(task_id)
             
-            if task_id in self.registered_tasks:
-                del self.registered_tasks[task_id]
+            del self.registered_tasks[task_id]
+            self._cpu_tasks.discard(task_id)
+            self._paused_tasks.discard(task_id)
             
-            conn = sqlite3.connect(self.database_path)
-            cursor = conn.cursor()
+            cursor = self._get_connection().cursor()
             cursor.execute('DELETE FROM task_configs WHERE id = ?', (task_id,))
-            conn.commit()
-            conn.close()
             
             logger.info(f"Task {task_id} removed")
             return True
@@ -918,64 +1215,117 @@ class TaskScheduler:
             logger.error(f"Error running task {task_id}: {e}")
             return False
     
-    def get_task_results(self, task_id: str = None, limit: int = 100) -> List[Dict[str, Any]]:
+    def get_task_results(self, task_id: str = None, limit: int = 100,
+                         before: Optional[Union[str, Tuple[str, int]]] = None) -> List[Dict[str, Any]]:
         """Get task execution results"""
         try:
-            conn = sqlite3.connect(self.database_path)
-            cursor = conn.cursor()
-            
-            if task_id:
-                cursor.execute('''
-                    SELECT * FROM task_results 
-                    WHERE task_id = ? 
-                    ORDER BY start_time DESC 
-                    LIMIT ?
-                ''', (task_id, limit))
-            else:
-                cursor.execute('''
-                    SELECT * FROM task_results 
-                    ORDER BY start_time DESC 
-                    LIMIT ?
-                ''', (limit,))
-            
-            rows = cursor.fetchall()
-            conn.close()
-            
-            results = []
-            for row in rows:
-                results.append({
-                    'id': row[0],
-                    'task_id': row[1],
-                    'success': bool(row[2]),
-                    'start_time': row[3],
-                    'end_time': row[4],
-                    'duration': row[5],
-                    'result': json.loads(row[6]) if row[6] else None,
-                    'error': row[7],
-                    'logs': json.loads(row[8]) if row[8] else [],
-                    'created_at': row[9]
-                })
-            
-            return results
+            return list(self.iter_task_results(task_id, limit, before))
             
         except Exception as e:
             logger.error(f"Error getting task results: {e}")
             return []
     
+    def get_task_results_page(self, task_id: str = None, limit: int = 100,
+                              before: Optional[Tuple[str, int]] = None) -> Dict[str, Any]:
+        """
+        Get one page of task execution results
+        
+        Args:
+            task_id: Only return results of this task
+            limit: Page size
+            before: next_cursor of the previous page, None for the first page
+            
+        Returns:
+            Dictionary with 'results' and 'next_cursor', a (start_time, id)
+            pair (None on the last page)
+        """
+        results = self.get_task_results(task_id, limit, before)
+        next_cursor = (results[-1]['start_time'], results[-1]['id']) if len(results) == limit else None
+        return {'results': results, 'next_cursor': next_cursor}
+    
+    def iter_task_results(self, task_id: str = None, limit: int = 100,
+                          before: Optional[Union[str, Tuple[str, int]]] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Yield task execution results one at a time, newest first
+        
+        Rows are read from the cursor as they are consumed rather than
+        fetched up front. Paging uses the (start_time, id) of the last row
+        seen as the key, which is an index seek rather than an OFFSET scan;
+        the id breaks ties between results sharing a start_time.
+        
+        Args:
+            task_id: Only return results of this task
+            limit: Maximum number of results
+            before: Only return results ordered after this (start_time, id)
+                cursor, or that started before this ISO timestamp
+            
+        Yields:
+            Result dictionaries
+        """
+        self._flush_buffers()
+        cursor = self._get_connection().cursor()
+        
+        conditions = []
+        params: List[Any] = []
+        if task_id:
+            conditions.append('task_id = ?')
+            params.append(task_id)
+        if isinstance(before, str):
+            conditions.append('start_time < ?')
+            params.append(before)
+        elif before:
+            conditions.append('(start_time, id) < (?, ?)')
+            params.extend(before)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+        params.append(limit)
+        
+        cursor.execute(f'''
+            SELECT * FROM task_results 
+            {where}
+            ORDER BY start_time DESC, id DESC
+            LIMIT ?
+        ''', params)
+        
+        for row in cursor:
+            yield {
+                'id': row[0],
+                'task_id': row[1],
+                'success': row[2] == 1,
+                'start_time': row[3],
+                'end_time': row[4],
+                'duration': row[5],
+                'result': _json_loads(row[6]) if row[6] else None,
+                'error': row[7],
+                'logs': _json_loads(row[8]) if row[8] else [],
+                'created_at': row[9]
+            }
+    
     # Default system tasks
     def _cleanup_old_data(self):
         """Clean up old data and logs"""
         try:
-            # Clean up old task results (older than 30 days)
-            conn = sqlite3.connect(self.database_path)
-            cursor = conn.cursor()
+            # Clean up old task results (older than the retention period)
+            cursor = self._get_connection().cursor()
             
-            cutoff_date = (datetime.now() - timedelta(days=30)).isoformat()
-            cursor.execute('DELETE FROM task_results WHERE start_time < ?', (cutoff_date,))
+            cutoff_date = (datetime.now() - timedelta(days=self.result_retention_days)).isoformat()
             
-            deleted_count = cursor.rowcount
-            conn.commit()
-            conn.close()
+            # Autocommit connection: each chunk commits on its own
+            deleted_count = 0
+            while True:
+                cursor.execute('''
+                    DELETE FROM task_results WHERE id IN (
+                        SELECT id FROM task_results WHERE start_time < ? LIMIT ?
+                    )
+                ''', (cutoff_date, CLEANUP_BATCH_SIZE))
+                if cursor.rowcount <= 0:
+                    break
+                deleted_count += cursor.rowcount
+            
+            # Reclaim freed pages and keep the WAL file from growing unbounded
+            cursor.execute('PRAGMA incremental_vacuum')
+            cursor.fetchall()
+            cursor.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+            cursor.fetchall()
             
             logger.info(f"Cleaned up {deleted_count} old task results")
             return f"Cleaned up {deleted_count} old task results"
@@ -988,11 +1338,9 @@ class TaskScheduler:
         """System health check"""
         try:
             # Check database connectivity
-            conn = sqlite3.connect(self.database_path)
-            cursor = conn.cursor()
+            cursor = self._get_connection().cursor()
             cursor.execute('SELECT COUNT(*) FROM task_configs')
             task_count = cursor.fetchone()[0]
-            conn.close()
             
             # Check scheduler status
             scheduler_running = self.scheduler.running
@@ -1018,35 +1366,21 @@ class TaskScheduler:
     def _collect_metrics(self):
         """Collect system metrics"""
         try:
-            # Get task statistics
-            tasks = self.get_all_tasks()
-            
-            metrics = {
-                'total_tasks': len(tasks),
-                'enabled_tasks': len([t for t in tasks if t['enabled']]),
-                'total_runs': sum(t['run_count'] for t in tasks),
-                'total_success': sum(t['success_count'] for t in tasks),
-                'total_failures': sum(t['failure_count'] for t in tasks),
-                'avg_success_rate': sum(t['success_rate'] for t in tasks) / max(len(tasks), 1),
+            # Snapshot the running totals; no per-task scan or database access
+            with self._metrics_lock:
+                metrics = dict(self._metrics)
+            
+            total_tasks = len(self.registered_tasks)
+            metrics.update({
+                'total_tasks': total_tasks,
+                'enabled_tasks': total_tasks - len(self._paused_tasks),
+                'success_rate': metrics['total_success'] / max(metrics['total_runs'], 1),
                 'timestamp': datetime.now().isoformat()
-            }
+            })
             
             logger.info("Metrics collection completed")
             return metrics
             
         except Exception as e:
             logger.error(f"Error in metrics collection task: {e}")
-            raise
-
-    # Wrapper methods to avoid serialization issues
-    def _cleanup_old_data_wrapper(self):
-        """Wrapper for data cleanup task"""
-        return self._cleanup_old_data()
-    
-    def _health_check_wrapper(self):
-        """Wrapper for health check task"""
-        return self._health_check()
-    
-    def _collect_metrics_wrapper(self):
-        """Wrapper for metrics collection task"""
-        return self._collect_metrics() 
\ No newline at end of file
+            raise 
\ No newline at end of file
@@ -4,20 +4,87 @@ Simple Task Scheduler for Professional Web Scraper
 A simplified scheduler that doesn't use APScheduler to avoid serialization issues.
 """
 
+import sys
 import logging
 import json
 import time
+import heapq
 import threading
-from typing import Dict, List, Any, Optional, Callable
+import queue
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Tuple, Any, Optional, Callable
 from dataclasses import dataclass, field
-from datetime import datetime, timedelta
+from datetime import datetime
 from pathlib import Path
 import sqlite3
 
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
 logger = logging.getLogger(__name__)
 
+# Applied once to the scheduler's long-lived database connection. mmap_size
+# lets reads go through a memory map instead of a pread() per page.
+SQLITE_PRAGMAS = (
+    'journal_mode=WAL',
+    'synchronous=NORMAL',
+    'temp_store=MEMORY',
+    'cache_size=-64000',
+    'mmap_size=268435456',
+)
+
+# Compact JSON for stored task results, backed by orjson when available;
+# values JSON can't represent are stored as their str()
+if ORJSON_AVAILABLE:
+    def _json_dumps(obj: Any) -> str:
+        return orjson.dumps(obj, default=str, option=orjson.OPT_NON_STR_KEYS).decode()
+else:
+    def _json_dumps(obj: Any) -> str:
+        return json.dumps(obj, separators=(',', ':'), default=str)
+
+# dataclass(slots=True) is only available on Python 3.10+
+_DATACLASS_SLOTS = {'slots': True} if sys.version_info >= (3, 10) else {}
+
+# Size of the per-connection compiled statement cache
+SQLITE_CACHED_STATEMENTS = 256
+
+# Hot-path statements; kept constant and bound positionally so they hit the
+# connection's statement cache instead of being re-parsed on every call
+# Only register_task writes the full row; re-registering keeps the stored
+# counters, last_run and created_at. Runs update just the mutable columns.
+_UPSERT_CONFIG_SQL = '''
+    INSERT INTO simple_task_configs 
+    (id, name, interval_seconds, enabled, description, created_at, next_run)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(id) DO UPDATE SET
+        name = excluded.name,
+        interval_seconds = excluded.interval_seconds,
+        enabled = excluded.enabled,
+        description = excluded.description,
+        next_run = excluded.next_run
+'''
+
+_INSERT_RESULT_SQL = '''
+    INSERT INTO simple_task_results 
+    (task_id, success, start_time, end_time, duration, result, error, created_at)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
+_UPDATE_STATS_SQL = '''
+    UPDATE simple_task_configs 
+    SET run_count = run_count + ?, 
+        success_count = success_count + ?,
+        failure_count = failure_count + ?,
+        last_run = ?,
+        next_run = ?
+    WHERE id = ?
+'''
 
-@dataclass
+
+@dataclass(**_DATACLASS_SLOTS)
 class SimpleTask:
     """Represents a simple scheduled task"""
     id: str
@@ -27,10 +94,15 @@ class SimpleTask:
     enabled: bool = True
     description: str = ""
     last_run: Optional[datetime] = None
-    next_run: Optional[datetime] = None
+    next_run_ts: float = 0.0  # Epoch seconds; 0 means not scheduled
     run_count: int = 0
     success_count: int = 0
     failure_count: int = 0
+    
+    @property
+    def next_run(self) -> Optional[datetime]:
+        """Next run time as a datetime, derived from next_run_ts"""
+        return datetime.fromtimestamp(self.next_run_ts) if self.next_run_ts else None
 
 
 class SimpleTaskScheduler:
@@ -57,6 +129,8 @@ class SimpleTaskScheduler:
         
         # Configuration
         self.check_interval = scheduler_config.get('check_interval', 60)  # Check every 60 seconds
+        self.result_batch_size = scheduler_config.get('result_batch_size', 64)
+        self.max_workers = scheduler_config.get('max_workers', 8)
         
         # Database configuration
         self.database_path = scheduler_config.get('database_path', 'simple_scheduler.db')
@@ -64,11 +138,30 @@ class SimpleTaskScheduler:
         # Task registry
         self.tasks: Dict[str, SimpleTask] = {}
         
+        # Min-heap of (next_run_ts, task_id). Entries whose time no longer
+        # matches the task's next_run_ts are stale and skipped when popped.
+        self._due_heap: List[Tuple[float, str]] = []
+        
+        # Set whenever the heap changes so the loop can recompute its sleep
+        self._wakeup = threading.Event()
+        
         # Thread safety
         self._lock = threading.Lock()
         self._running = False
         self._scheduler_thread = None
         
+        # Bounded worker pool for task executions (created lazily)
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._executor_lock = threading.Lock()
+        
+        # Shared database connection; sqlite3 connections are not thread-safe
+        self._db: Optional[sqlite3.Connection] = None
+        self._db_lock = threading.Lock()
+        
+        # Result rows are written in batches by a background writer thread
+        self._result_queue: queue.Queue = queue.Queue()
+        self._writer_thread: Optional[threading.Thread] = None
+        
         # Initialize database
         self._init_database()
         
@@ -77,46 +170,60 @@ class SimpleTaskScheduler:
         
         logger.info("Simple task scheduler initialized")
     
+    def _get_connection(self) -> sqlite3.Connection:
+        """Get the shared database connection, opening it on first use"""
+        if self._db is None:
+            # Autocommit mode; each statement commits on its own
+            conn = sqlite3.connect(self.database_path, check_same_thread=False, isolation_level=None,
+                                   cached_statements=SQLITE_CACHED_STATEMENTS)
+            conn.executescript(''.join(f'PRAGMA {pragma};' for pragma in SQLITE_PRAGMAS))
+            self._db = conn
+        return self._db
+    
+    def _close_connection(self):
+        """Close the shared database connection"""
+        with self._db_lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+    
     def _init_database(self):
         """Initialize SQLite database for task results"""
         try:
-            conn = sqlite3.connect(self.database_path)
-            cursor = conn.cursor()
-            
-            # Create task results table
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS simple_task_results (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    task_id TEXT NOT NULL,
-                    success BOOLEAN NOT NULL,
-                    start_time TEXT NOT NULL,
-                    end_time TEXT NOT NULL,
-                    duration REAL NOT NULL,
-                    result TEXT,
-                    error TEXT,
-                    created_at TEXT NOT NULL
-                )
-            ''')
-            
-            # Create task configurations table
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS simple_task_configs (
-                    id TEXT PRIMARY KEY,
-                    name TEXT NOT NULL,
-                    interval_seconds INTEGER NOT NULL,
-                    enabled BOOLEAN NOT NULL,
-                    description TEXT,
-                    created_at TEXT NOT NULL,
-                    last_run TEXT,
-                    next_run TEXT,
-                    run_count INTEGER DEFAULT 0,
-                    success_count INTEGER DEFAULT 0,
-                    failure_count INTEGER DEFAULT 0
-                )
-            ''')
-            
-            conn.commit()
-            conn.close()
+            with self._db_lock:
+                cursor = self._get_connection().cursor()
+                
+                # Create task results table
+                cursor.execute('''
+                    CREATE TABLE IF NOT EXISTS simple_task_results (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        task_id TEXT NOT NULL,
+                        success INTEGER NOT NULL,
+                        start_time TEXT NOT NULL,
+                        end_time TEXT NOT NULL,
+                        duration REAL NOT NULL,
+                        result TEXT,
+                        error TEXT,
+                        created_at TEXT NOT NULL
+                    )
+                ''')
+                
+                # Create task configurations table
+                cursor.execute('''
+                    CREATE TABLE IF NOT EXISTS simple_task_configs (
+                        id TEXT PRIMARY KEY,
+                        name TEXT NOT NULL,
+                        interval_seconds INTEGER NOT NULL,
+                        enabled INTEGER NOT NULL,
+                        description TEXT,
+                        created_at TEXT NOT NULL,
+                        last_run TEXT,
+                        next_run TEXT,
+                        run_count INTEGER DEFAULT 0,
+                        success_count INTEGER DEFAULT 0,
+                        failure_count INTEGER DEFAULT 0
+                    )
+                ''')
             
         except Exception as e:
             logger.error(f"Failed to initialize simple scheduler database: {e}")
@@ -171,10 +278,11 @@ class SimpleTaskScheduler:
                     function=function,
                     interval_seconds=interval_seconds,
                     description=description,
-                    next_run=datetime.now() + timedelta(seconds=interval_seconds)
+                    next_run_ts=time.time() + interval_seconds
                 )
                 
                 self.tasks[task_id] = task
+                self._push_due(task)
                 
                 # Store task configuration
                 self._store_task_config(task)
@@ -195,6 +303,12 @@ class SimpleTaskScheduler:
             self._running = True
             self._scheduler_thread = threading.Thread(target=self._scheduler_loop, daemon=True)
             self._scheduler_thread.start()
+            self._writer_thread = threading.Thread(
+                target=self._writer_loop,
+                name='simple-scheduler-writer',
+                daemon=True
+            )
+            self._writer_thread.start()
             logger.info("Simple task scheduler started")
         except Exception as e:
             logger.error(f"Error starting simple scheduler: {e}")
@@ -206,39 +320,80 @@ class SimpleTaskScheduler:
         
         try:
             self._running = False
+            self._wakeup.set()
             if self._scheduler_thread:
                 self._scheduler_thread.join(timeout=5)
+            
+            # Running tasks finish in the background; their results are written inline
+            with self._executor_lock:
+                if self._executor:
+                    self._executor.shutdown(wait=False)
+                    self._executor = None
+            
+            # Let the writer store pending results, then stop it
+            if self._writer_thread and self._writer_thread.is_alive():
+                self._result_queue.put(None)
+                self._writer_thread.join(timeout=30)
+            self._flush_results()
+            
+            self._close_connection()
             logger.info("Simple task scheduler stopped")
         except Exception as e:
             logger.error(f"Error stopping simple scheduler: {e}")
     
+    def _get_executor(self) -> ThreadPoolExecutor:
+        """Get the worker pool that runs task executions"""
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers,
+                    thread_name_prefix='simple-scheduler'
+                )
+            return self._executor
+    
+    def _push_due(self, task: SimpleTask):
+        """Queue a task's next run on the heap and wake the scheduler loop (caller holds the lock)"""
+        heapq.heappush(self._due_heap, (task.next_run_ts, task.id))
+        self._wakeup.set()
+    
     def _scheduler_loop(self):
         """Main scheduler loop"""
         while self._running:
             try:
-                current_time = datetime.now()
+                self._wakeup.clear()
+                now_ts = time.time()
                 
+                # Collect due tasks under the lock; dispatch them after releasing it
+                due: List[str] = []
                 with self._lock:
-                    for task_id, task in self.tasks.items():
-                        if task.enabled and task.next_run and current_time >= task.next_run:
-                            # Execute task in a separate thread
-                            thread = threading.Thread(
-                                target=self._execute_task,
-                                args=(task_id,),
-                                daemon=True
-                            )
-                            thread.start()
+                    while self._due_heap and self._due_heap[0][0] <= now_ts:
+                        due_ts, task_id = heapq.heappop(self._due_heap)
+                        task = self.tasks.get(task_id)
+                        if (task is None or not task.enabled or task.next_run_ts != due_ts
+                                or task_id in due):
+                            continue
+                        due.append(task_id)
+                    
+                    # Sleep until the next task is due, at most the check interval;
+                    # new or re-enabled tasks cut the wait short via _wakeup
+                    sleep_for = self.check_interval
+                    if self._due_heap:
+                        sleep_for = min(sleep_for, self._due_heap[0][0] - now_ts)
                 
-                # Sleep for check interval
-                time.sleep(self.check_interval)
+                for task_id in due:
+                    self._get_executor().submit(self._execute_task, task_id)
+                
+                self._wakeup.wait(timeout=max(sleep_for, 0))
                 
             except Exception as e:
                 logger.error(f"Error in scheduler loop: {e}")
-                time.sleep(self.check_interval)
+                self._wakeup.wait(timeout=self.check_interval)
     
     def _execute_task(self, task_id: str):
         """Execute a scheduled task"""
-        start_time = datetime.now()
+        start_ts = time.time()
+        start_time = datetime.fromtimestamp(start_ts)
+        next_run_ts = None
         
         try:
             with self._lock:
@@ -247,8 +402,9 @@ class SimpleTaskScheduler:
                 
                 task = self.tasks[task_id]
                 
-                # Update next run time
-                task.next_run = datetime.now() + timedelta(seconds=task.interval_seconds)
+                # Update next run time from the same clock reading as the start time
+                task.next_run_ts = next_run_ts = start_ts + task.interval_seconds
+                self._push_due(task)
                 task.last_run = start_time
                 task.run_count += 1
             
@@ -263,7 +419,7 @@ class SimpleTaskScheduler:
             
             # Store result
             end_time = datetime.now()
-            self._store_task_result(task_id, True, start_time, end_time, result, None)
+            self._store_task_result(task_id, True, start_time, end_time, result, None, next_run_ts)
             
         except Exception as e:
             # Update failure count
@@ -274,68 +430,118 @@ class SimpleTaskScheduler:
             # Store error result
             end_time = datetime.now()
             error_msg = str(e)
-            self._store_task_result(task_id, False, start_time, end_time, None, error_msg)
+            self._store_task_result(task_id, False, start_time, end_time, None, error_msg, next_run_ts)
             
             logger.error(f"Simple task {task_id} failed: {e}")
     
     def _store_task_config(self, task: SimpleTask):
         """Store task configuration"""
         try:
-            conn = sqlite3.connect(self.database_path)
-            cursor = conn.cursor()
-            
-            cursor.execute('''
-                INSERT OR REPLACE INTO simple_task_configs 
-                (id, name, interval_seconds, enabled, description, created_at, last_run, next_run, 
-                 run_count, success_count, failure_count)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                task.id,
-                task.name,
-                task.interval_seconds,
-                task.enabled,
-                task.description,
-                datetime.now().isoformat(),
-                task.last_run.isoformat() if task.last_run else None,
-                task.next_run.isoformat() if task.next_run else None,
-                task.run_count,
-                task.success_count,
-                task.failure_count
-            ))
-            
-            conn.commit()
-            conn.close()
+            with self._db_lock:
+                self._get_connection().execute(_UPSERT_CONFIG_SQL, (
+                    task.id,
+                    task.name,
+                    task.interval_seconds,
+                    task.enabled,
+                    task.description,
+                    datetime.now().isoformat(),
+                    task.next_run.isoformat() if task.next_run else None
+                ))
             
         except Exception as e:
             logger.error(f"Error storing simple task config: {e}")
     
     def _store_task_result(self, task_id: str, success: bool, start_time: datetime,
-                          end_time: datetime, result: Any, error: str):
-        """Store task result"""
+                          end_time: datetime, result: Any, error: str,
+                          next_run_ts: Optional[float] = None):
+        """Queue a task result, and the stats update it implies, for the writer thread"""
         try:
-            conn = sqlite3.connect(self.database_path)
-            cursor = conn.cursor()
+            result_blob = None if result is None else _json_dumps(result)
             
-            cursor.execute('''
-                INSERT INTO simple_task_results 
-                (task_id, success, start_time, end_time, duration, result, error, created_at)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (
+            end_time_iso = end_time.isoformat()
+            row = (
                 task_id,
                 success,
                 start_time.isoformat(),
-                end_time.isoformat(),
+                end_time_iso,
                 (end_time - start_time).total_seconds(),
-                json.dumps(result) if result else None,
+                result_blob,
                 error,
-                datetime.now().isoformat()
-            ))
-            
-            conn.commit()
-            conn.close()
-            
+                end_time_iso
+            )
         except Exception as e:
             logger.error(f"Error storing simple task result: {e}")
+            return
+        
+        item = (row, datetime.fromtimestamp(next_run_ts).isoformat() if next_run_ts else None)
+        if self._writer_thread and self._writer_thread.is_alive():
+            self._result_queue.put(item)
+        else:
+            # No writer running (not started yet or stopped): write in this thread
+            self._write_results([item])
+    
+    def _writer_loop(self):
+        """Write queued results in batches until a None sentinel is received"""
+        while True:
+            # Block for the first result, then take whatever else is already queued
+            items = [self._result_queue.get()]
+            while len(items) < self.result_batch_size:
+                try:
+                    items.append(self._result_queue.get_nowait())
+                except queue.Empty:
+                    break
+            
+            results = [item for item in items if item is not None]
+            if results:
+                self._write_results(results)
+            
+            if len(results) != len(items):
+                break
+    
+    def _flush_results(self):
+        """Write any results still queued, in the calling thread"""
+        results = []
+        while True:
+            try:
+                item = self._result_queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not None:
+                results.append(item)
+        
+        if results:
+            self._write_results(results)
+    
+    def _write_results(self, results: List[Tuple[tuple, Optional[str]]]):
+        """Insert result rows and apply their stats in a single transaction"""
+        rows = [row for row, _ in results]
+        
+        # Coalesce counters per task: [runs, successes, failures, last_run, next_run]
+        stats: Dict[str, List[Any]] = {}
+        for row, next_run in results:
+            task_stats = stats.setdefault(row[0], [0, 0, 0, None, None])
+            task_stats[0] += 1
+            if row[1]:
+                task_stats[1] += 1
+            else:
+                task_stats[2] += 1
+            task_stats[3] = row[2]
+            task_stats[4] = next_run
+        
+        with self._db_lock:
+            cursor = self._get_connection().cursor()
+            try:
+                cursor.execute('BEGIN IMMEDIATE')
+                cursor.executemany(_INSERT_RESULT_SQL, rows)
+                cursor.executemany(_UPDATE_STATS_SQL, [
+                    (runs, successes, failures, last_run, next_run, task_id)
+                    for task_id, (runs, successes, failures, last_run, next_run) in stats.items()
+                ])
+                cursor.execute('COMMIT')
+            except Exception as e:
+                if cursor.connection.in_transaction:
+                    cursor.execute('ROLLBACK')
+                logger.error(f"Error storing {len(rows)} simple task results: {e}")
     
     def get_all_tasks(self) -> List[Dict[str, Any]]:
         """Get all registered tasks"""
@@ -359,8 +565,13 @@ class SimpleTaskScheduler:
     def enable_task(self, task_id: str) -> bool:
         """Enable a task"""
         with self._lock:
-            if task_id in self.tasks:
-                self.tasks[task_id].enabled = True
+            task = self.tasks.get(task_id)
+            if task:
+                was_disabled = not task.enabled
+                task.enabled = True
+                if was_disabled and task.next_run_ts:
+                    # Its heap entry was dropped while disabled
+                    self._push_due(task)
                 return True
         return False
     
@@ -383,16 +594,12 @@ class SimpleTaskScheduler:
     def run_task_now(self, task_id: str) -> bool:
         """Run a task immediately"""
         with self._lock:
-            if task_id in self.tasks:
-                # Execute task in a separate thread
-                thread = threading.Thread(
-                    target=self._execute_task,
-                    args=(task_id,),
-                    daemon=True
-                )
-                thread.start()
-                return True
-        return False
+            if task_id not in self.tasks:
+                return False
+        
+        # Execute task in the worker pool, outside the lock
+        self._get_executor().submit(self._execute_task, task_id)
+        return True
     
     # Default task functions
     def _simple_cleanup(self):
@@ -7,35 +7,185 @@ análisis paralelo y detección automática de patrones.
 """
 
 import logging
+import sys
 import time
 import threading
 from typing import Dict, List, Any, Optional, Union, Tuple, Set
-from dataclasses import dataclass, field
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field, replace
 from functools import lru_cache
+from itertools import islice
 import hashlib
 import json
-from collections import defaultdict, Counter
+from collections import defaultdict, Counter, OrderedDict
 import re
+import weakref
 
-from bs4 import BeautifulSoup, Tag, NavigableString
+import numpy as np
 from readability import Document
 import lxml.etree as etree
+import lxml.html
+from lxml.cssselect import CSSSelector
+from lxml.html import HtmlElement
+
+try:
+    import xxhash
+    XXHASH_AVAILABLE = True
+except ImportError:
+    XXHASH_AVAILABLE = False
 
 logger = logging.getLogger(__name__)
 
+# dataclass(slots=True) solo está disponible en Python 3.10+
+_DATACLASS_SLOTS = {'slots': True} if sys.version_info >= (3, 10) else {}
 
-@dataclass
+# Subcadenas de clase usadas por los selectores [class*="..."] de cards y grids.
+# Se resuelven con una sola búsqueda por elemento al construir el DomIndex
+# (el lookahead permite coincidencias solapadas).
+_CLASS_SUBSTRINGS = ('card', 'item', 'product', 'grid', 'row', 'col')
+_CLASS_SUBSTRING_RE = re.compile('(?=(%s))' % '|'.join(_CLASS_SUBSTRINGS))
+
+# Selectores de los detectores; DomIndex.select los resuelve desde sus índices
+_CARD_SELECTORS = (
+    '.card', '.item', '.product', '.article', '.post',
+    '[class*="card"]', '[class*="item"]', '[class*="product"]'
+)
+_GRID_SELECTORS = (
+    '.grid', '.row', '.col', '.flex', '.flexbox',
+    '[class*="grid"]', '[class*="row"]', '[class*="col"]'
+)
+_LAYOUT_SELECTORS = (
+    '.header', '.footer', '.sidebar', '.main', '.content',
+    'header', 'footer', 'aside', 'main'
+)
+
+# Bloques de contenido importantes, compilados a XPath una sola vez
+_CONTENT_BLOCK_SELECTORS = tuple(
+    (selector, CSSSelector(selector, translator='html'))
+    for selector in (
+        'main', 'article', '.content', '.main', '.post',
+        'nav', '.navigation', '.menu',
+        'aside', '.sidebar', '.widget'
+    )
+)
+
+# Clases que identifican artículos y navegación además de <article>/<nav>
+_ARTICLE_CLASSES = frozenset(('article', 'post', 'entry'))
+_NAVIGATION_CLASSES = frozenset(('nav', 'navigation', 'menu'))
+
+# Dominio (netloc) de un enlace absoluto http(s)
+_NETLOC_RE = re.compile(r'^https?://([^/?#]+)')
+
+# Conteos de los scores evaluados en C por lxml, sin materializar listas.
+# descendant-or-self equivale a root.iter() aunque se pase un subárbol.
+# El texto de enlaces trata &nbsp; como espacio, igual que str.strip().
+_COUNT_XPATHS = {
+    name: etree.XPath(f'count(descendant-or-self::{expr})')
+    for name, expr in {
+        'images': 'img',
+        'images_without_alt': 'img[not(string(@alt))]',
+        'images_not_lazy': 'img[not(@loading="lazy")]',
+        'links': 'a',
+        'links_without_text': 'a[not(normalize-space(translate(., "\u00a0", " ")))]',
+        'inputs': 'input',
+        'inputs_without_label': 'input[not(string(@id)) and not(string(@aria-label))]',
+        'blocking_scripts': 'script[not(@async) and not(@defer)]',
+        'styled_elements': '*[@style]',
+    }.items()
+}
+
+
+# Conteos de descendientes usados por la estructura semántica
+_COUNT_INPUTS = etree.XPath('count(.//input)')
+_COUNT_ROWS = etree.XPath('count(.//tr)')
+_COUNT_HEADERS = etree.XPath('count(.//th)')
+
+
+def _count_all(root: HtmlElement) -> Dict[str, int]:
+    """Evalúa todos los conteos XPath precompilados sobre el subárbol"""
+    return {name: int(xpath(root)) for name, xpath in _COUNT_XPATHS.items()}
+
+
+def _parse_html(html: str) -> HtmlElement:
+    """Parsea un documento HTML completo con lxml (siempre devuelve <html>)"""
+    return lxml.html.document_fromstring(html)
+
+
+def _hash_html(html: Union[str, bytes]) -> str:
+    """Hash rápido (no criptográfico) del HTML para usar como clave de cache"""
+    data = html.encode('utf-8', 'surrogatepass') if isinstance(html, str) else html
+    if XXHASH_AVAILABLE:
+        return xxhash.xxh3_128_hexdigest(data)
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def _iter_elements(root: HtmlElement):
+    """Itera los elementos del árbol (sin comentarios ni instrucciones)"""
+    return root.iter(etree.Element)
+
+
+# Etiquetas cuyo texto BeautifulSoup guarda como un tipo de cadena propio:
+# cuenta para la propia etiqueta pero no para get_text() de sus ancestros
+_STRING_CONTAINER_TAGS = frozenset(('script', 'style', 'template', 'rt', 'rp'))
+
+_XP_TEXT = etree.XPath('descendant-or-self::text()')
+# Centinela de _get_text: elemento cuyo contenedor aún no se ha resuelto
+_UNSET = object()
+
+
+def _get_text(element: HtmlElement) -> str:
+    """
+    Texto del elemento con cada fragmento recortado, como get_text(strip=True)
+    
+    Igual que en BeautifulSoup, el texto de script/style/template/rt/rp solo
+    cuenta para esa etiqueta: no aparece en el de sus ancestros, y los
+    elementos dentro de un contenedor no tienen texto propio.
+    """
+    tag = element.tag
+    if tag in _STRING_CONTAINER_TAGS:
+        own = tag
+    else:
+        own = None
+        if next(element.iterancestors(*_STRING_CONTAINER_TAGS), None) is not None:
+            return ''
+        # Caso habitual: ningún contenedor debajo, basta con itertext()
+        if next(element.iterdescendants(*_STRING_CONTAINER_TAGS), None) is None:
+            return ''.join(text.strip() for text in element.itertext())
+    
+    # Contenedor de texto en vigor para cada elemento, resuelto una vez
+    contexts = {element: own}
+    parts = []
+    for text in _XP_TEXT(element):
+        owner = text.getparent()
+        if text.is_tail:
+            owner = owner.getparent()
+        context = contexts.get(owner, _UNSET)
+        if context is _UNSET:
+            chain = []
+            node = owner
+            while context is _UNSET:
+                chain.append(node)
+                node = node.getparent()
+                context = contexts.get(node, _UNSET)
+            for node in reversed(chain):
+                if node.tag in _STRING_CONTAINER_TAGS:
+                    context = node.tag
+                contexts[node] = context
+        if context == own:
+            parts.append(text.strip())
+    return ''.join(parts)
+
+
+@dataclass(**_DATACLASS_SLOTS)
 class ElementPattern:
     """Patrón detectado en elementos HTML"""
     pattern_type: str  # 'repetitive', 'semantic', 'structural', 'content'
-    elements: List[Tag]
+    elements: List[HtmlElement]
     confidence: float
     selector: str
     description: str
 
 
-@dataclass
+@dataclass(**_DATACLASS_SLOTS)
 class IncrementalAnalysis:
     """Análisis incremental que se actualiza en tiempo real"""
     url: str
@@ -48,9 +198,27 @@ class IncrementalAnalysis:
     performance_score: float
     last_update: float
     is_complete: bool = False
+    
+    def to_cacheable(self) -> 'IncrementalAnalysis':
+        """
+        Copia para el cache sin referencias a elementos del árbol
+        
+        Los patrones conservan tipo, selector, confianza y descripción, pero
+        elements queda vacío: así el cache no mantiene vivos los DOM parseados.
+        """
+        return replace(self, patterns_detected=[
+            replace(pattern, elements=[]) for pattern in self.patterns_detected
+        ])
 
 
-@dataclass
+@dataclass(**_DATACLASS_SLOTS)
+class BlockAnalysis:
+    """Resultados aditivos de un bloque de primer nivel, reutilizables entre documentos"""
+    block_hash: str
+    counts: Dict[str, int]
+
+
+@dataclass(**_DATACLASS_SLOTS)
 class PatternResult:
     """Resultado de la detección de patrones"""
     patterns: List[ElementPattern]
@@ -59,53 +227,162 @@ class PatternResult:
     suggestions: List[str]
 
 
+@dataclass
+class DomIndex:
+    """Índices del DOM construidos en un solo recorrido, compartidos por los detectores"""
+    root: HtmlElement
+    total_elements: int = 0
+    by_tag: Dict[str, List[HtmlElement]] = field(default_factory=lambda: defaultdict(list))
+    by_class_token: Dict[str, List[HtmlElement]] = field(default_factory=lambda: defaultdict(list))
+    with_attr: Dict[str, List[HtmlElement]] = field(default_factory=lambda: defaultdict(list))
+    by_class_substring: Dict[str, List[HtmlElement]] = field(default_factory=lambda: defaultdict(list))
+    # Estructura de hijos por id(elemento); los ids son estables mientras el índice
+    # mantenga vivos los proxies de lxml
+    structures: Dict[int, Tuple[str, ...]] = field(default_factory=dict)
+    # "article, .article, .post, .entry" y "nav, .nav, .navigation, .menu"
+    articles: List[HtmlElement] = field(default_factory=list)
+    navigation: List[HtmlElement] = field(default_factory=list)
+    
+    @classmethod
+    def build(cls, root: HtmlElement) -> 'DomIndex':
+        """Recorre el árbol una vez y agrupa elementos por tag, clase y atributo"""
+        index = cls(root=root)
+        by_tag = index.by_tag
+        by_class_token = index.by_class_token
+        with_attr = index.with_attr
+        by_class_substring = index.by_class_substring
+        find_substrings = _CLASS_SUBSTRING_RE.findall
+        articles = index.articles
+        navigation = index.navigation
+        total = 0
+        
+        for element in _iter_elements(root):
+            total += 1
+            tag = sys.intern(element.tag)
+            by_tag[tag].append(element)
+            attrib = element.attrib
+            for name in attrib:
+                with_attr[name].append(element)
+            class_attr = attrib.get('class')
+            tokens = set(class_attr.split()) if class_attr else ()
+            for token in tokens:
+                by_class_token[token].append(element)
+            if class_attr:
+                for substring in set(find_substrings(class_attr)):
+                    by_class_substring[substring].append(element)
+            if tag == 'article' or not _ARTICLE_CLASSES.isdisjoint(tokens):
+                articles.append(element)
+            if tag == 'nav' or not _NAVIGATION_CLASSES.isdisjoint(tokens):
+                navigation.append(element)
+        
+        index.total_elements = total
+        return index
+    
+    def tags(self, name: str) -> List[HtmlElement]:
+        """Elementos con el tag dado, en orden de documento"""
+        return self.by_tag.get(name, [])
+    
+    def select(self, selector: str) -> List[HtmlElement]:
+        """Resuelve selectores simples ('tag', '.clase', '[class*="texto"]') desde los índices"""
+        if selector.startswith('.'):
+            return self.by_class_token.get(selector[1:], [])
+        if selector.startswith('[class*='):
+            substring = selector[len('[class*='):-1].strip('"\'')
+            if substring in _CLASS_SUBSTRINGS:
+                return self.by_class_substring.get(substring, [])
+            return [e for e in self.with_attr.get('class', []) if substring in e.get('class')]
+        return self.tags(selector)
+
+
+class _LRUShard:
+    """Estado del cache propio de un hilo (solo lo modifica ese hilo)"""
+    
+    __slots__ = ('cache', 'hits', 'misses', 'generation', '__weakref__')
+    
+    def __init__(self, generation: int):
+        # El orden de inserción es el orden de uso: el primero es el menos reciente
+        self.cache: OrderedDict = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.generation = generation
+
+
 class LRUCache:
-    """Cache LRU optimizado para análisis HTML"""
+    """
+    Cache LRU optimizado para análisis HTML
+    
+    Cada hilo tiene su propio shard, así get/set no comparten ningún lock.
+    maxsize se aplica por hilo.
+    """
     
     def __init__(self, maxsize: int = 1000):
         self.maxsize = maxsize
-        self.cache = {}
-        self.access_order = []
-        self.lock = threading.Lock()
+        self._local = threading.local()
+        # Vistas de todos los hilos vivos, solo para get_stats()
+        self._shards: 'weakref.WeakSet[_LRUShard]' = weakref.WeakSet()
+        self._shards_lock = threading.Lock()
+        # clear() incrementa la generación; cada hilo vacía su shard al notarlo
+        self._generation = 0
+    
+    def _shard(self) -> _LRUShard:
+        """Obtiene (o crea) el shard del hilo actual"""
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = _LRUShard(self._generation)
+            self._local.shard = shard
+            with self._shards_lock:
+                self._shards.add(shard)
+        elif shard.generation != self._generation:
+            shard.cache.clear()
+            shard.hits = 0
+            shard.misses = 0
+            shard.generation = self._generation
+        return shard
     
     def get(self, key: str) -> Optional[Any]:
         """Obtiene un elemento del cache"""
-        with self.lock:
-            if key in self.cache:
-                # Mover al final (más reciente)
-                self.access_order.remove(key)
-                self.access_order.append(key)
-                return self.cache[key]
+        shard = self._shard()
+        value = shard.cache.get(key)
+        if value is None:
+            shard.misses += 1
             return None
+        # Mover al final (más reciente)
+        shard.cache.move_to_end(key)
+        shard.hits += 1
+        return value
     
     def set(self, key: str, value: Any):
         """Establece un elemento en el cache"""
-        with self.lock:
-            if key in self.cache:
-                # Actualizar elemento existente
-                self.access_order.remove(key)
-            elif len(self.cache) >= self.maxsize:
-                # Eliminar elemento menos usado
-                oldest = self.access_order.pop(0)
-                del self.cache[oldest]
-            
-            self.cache[key] = value
-            self.access_order.append(key)
+        cache = self._shard().cache
+        cache[key] = value
+        cache.move_to_end(key)
+        if len(cache) > self.maxsize:
+            # Eliminar elemento menos usado
+            cache.popitem(last=False)
     
     def clear(self):
-        """Limpia el cache"""
-        with self.lock:
-            self.cache.clear()
-            self.access_order.clear()
+        """Limpia el cache de todos los hilos"""
+        # += no es atómico: dos clear() simultáneos podrían perder un incremento
+        with self._shards_lock:
+            self._generation += 1
+        self._shard()
     
     def get_stats(self) -> Dict[str, Any]:
-        """Obtiene estadísticas del cache"""
-        with self.lock:
-            return {
-                'size': len(self.cache),
-                'maxsize': self.maxsize,
-                'hit_rate': 0.0  # TODO: Implementar tracking de hits
-            }
+        """Obtiene estadísticas del cache agregadas de todos los hilos"""
+        with self._shards_lock:
+            shards = [s for s in self._shards if s.generation == self._generation]
+        size = sum(len(s.cache) for s in shards)
+        hits = sum(s.hits for s in shards)
+        misses = sum(s.misses for s in shards)
+        lookups = hits + misses
+        return {
+            'size': size,
+            'maxsize': self.maxsize,
+            'threads': len(shards),
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': hits / lookups if lookups else 0.0
+        }
 
 
 class PatternDetector:
@@ -135,15 +412,17 @@ class PatternDetector:
             ]
         }
     
-    def detect_patterns(self, soup: BeautifulSoup) -> PatternResult:
+    def detect_patterns(self, root: HtmlElement) -> PatternResult:
         """Detecta patrones en el HTML"""
         patterns = []
-        total_elements = len(soup.find_all())
+        # Un único recorrido del árbol; los detectores leen de los índices
+        index = DomIndex.build(root)
+        total_elements = index.total_elements
         
         for pattern_type, detectors in self.pattern_rules.items():
             for detector in detectors:
                 try:
-                    detected_patterns = detector(soup)
+                    detected_patterns = detector(index)
                     patterns.extend(detected_patterns)
                 except Exception as e:
                     logger.warning(f"Error en detector {detector.__name__}: {e}")
@@ -165,20 +444,19 @@ class PatternDetector:
             suggestions=suggestions
         )
     
-    def _detect_list_patterns(self, soup: BeautifulSoup) -> List[ElementPattern]:
+    def _detect_list_patterns(self, index: DomIndex) -> List[ElementPattern]:
         """Detecta patrones de listas"""
         patterns = []
         
         # Listas ordenadas y no ordenadas
         for list_type in ['ul', 'ol']:
-            lists = soup.find_all(list_type)
+            lists = index.tags(list_type)
             if len(lists) >= 2:
                 # Verificar si tienen estructura similar
                 for i, lst in enumerate(lists):
-                    items = lst.find_all('li')
-                    if len(items) >= 3:
-                        # Analizar estructura de items
-                        item_texts = [item.get_text(strip=True) for item in items]
+                    # Analizar estructura de items
+                    item_texts = [_get_text(item) for item in lst.iterdescendants('li')]
+                    if len(item_texts) >= 3:
                         if self._is_consistent_pattern(item_texts):
                             patterns.append(ElementPattern(
                                 pattern_type='repetitive',
@@ -190,16 +468,17 @@ class PatternDetector:
         
         return patterns
     
-    def _detect_table_patterns(self, soup: BeautifulSoup) -> List[ElementPattern]:
+    def _detect_table_patterns(self, index: DomIndex) -> List[ElementPattern]:
         """Detecta patrones en tablas"""
         patterns = []
-        tables = soup.find_all('table')
+        tables = index.tags('table')
         
         for table in tables:
-            rows = table.find_all('tr')
+            # Solo importa si hay al menos 3 filas y 2 celdas: no se listan todas
+            rows = list(islice(table.iterdescendants('tr'), 3))
             if len(rows) >= 3:
                 # Verificar estructura de columnas
-                headers = rows[0].find_all(['th', 'td'])
+                headers = list(islice(rows[0].iterdescendants('th', 'td'), 2))
                 if len(headers) >= 2:
                     patterns.append(ElementPattern(
                         pattern_type='structural',
@@ -211,21 +490,16 @@ class PatternDetector:
         
         return patterns
     
-    def _detect_card_patterns(self, soup: BeautifulSoup) -> List[ElementPattern]:
+    def _detect_card_patterns(self, index: DomIndex) -> List[ElementPattern]:
         """Detecta patrones de tarjetas/cards"""
         patterns = []
         
         # Buscar elementos que podrían ser cards
-        card_selectors = [
-            '.card', '.item', '.product', '.article', '.post',
-            '[class*="card"]', '[class*="item"]', '[class*="product"]'
-        ]
-        
-        for selector in card_selectors:
-            cards = soup.select(selector)
+        for selector in _CARD_SELECTORS:
+            cards = index.select(selector)
             if len(cards) >= 2:
                 # Verificar estructura similar
-                if self._has_similar_structure(cards):
+                if self._has_similar_structure(cards, index):
                     patterns.append(ElementPattern(
                         pattern_type='repetitive',
                         elements=cards,
@@ -236,11 +510,11 @@ class PatternDetector:
         
         return patterns
     
-    def _detect_article_patterns(self, soup: BeautifulSoup) -> List[ElementPattern]:
+    def _detect_article_patterns(self, index: DomIndex) -> List[ElementPattern]:
         """Detecta patrones de artículos"""
         patterns = []
         
-        articles = soup.find_all(['article', '.article', '.post', '.entry'])
+        articles = index.articles
         if len(articles) >= 2:
             patterns.append(ElementPattern(
                 pattern_type='semantic',
@@ -252,11 +526,11 @@ class PatternDetector:
         
         return patterns
     
-    def _detect_navigation_patterns(self, soup: BeautifulSoup) -> List[ElementPattern]:
+    def _detect_navigation_patterns(self, index: DomIndex) -> List[ElementPattern]:
         """Detecta patrones de navegación"""
         patterns = []
         
-        nav_elements = soup.find_all(['nav', '.nav', '.navigation', '.menu'])
+        nav_elements = index.navigation
         if nav_elements:
             patterns.append(ElementPattern(
                 pattern_type='semantic',
@@ -268,11 +542,11 @@ class PatternDetector:
         
         return patterns
     
-    def _detect_form_patterns(self, soup: BeautifulSoup) -> List[ElementPattern]:
+    def _detect_form_patterns(self, index: DomIndex) -> List[ElementPattern]:
         """Detecta patrones de formularios"""
         patterns = []
         
-        forms = soup.find_all('form')
+        forms = index.tags('form')
         if forms:
             patterns.append(ElementPattern(
                 pattern_type='semantic',
@@ -284,17 +558,12 @@ class PatternDetector:
         
         return patterns
     
-    def _detect_grid_patterns(self, soup: BeautifulSoup) -> List[ElementPattern]:
+    def _detect_grid_patterns(self, index: DomIndex) -> List[ElementPattern]:
         """Detecta patrones de grid"""
         patterns = []
         
-        grid_selectors = [
-            '.grid', '.row', '.col', '.flex', '.flexbox',
-            '[class*="grid"]', '[class*="row"]', '[class*="col"]'
-        ]
-        
-        for selector in grid_selectors:
-            elements = soup.select(selector)
+        for selector in _GRID_SELECTORS:
+            elements = index.select(selector)
             if len(elements) >= 3:
                 patterns.append(ElementPattern(
                     pattern_type='structural',
@@ -306,17 +575,12 @@ class PatternDetector:
         
         return patterns
     
-    def _detect_layout_patterns(self, soup: BeautifulSoup) -> List[ElementPattern]:
+    def _detect_layout_patterns(self, index: DomIndex) -> List[ElementPattern]:
         """Detecta patrones de layout"""
         patterns = []
         
-        layout_selectors = [
-            '.header', '.footer', '.sidebar', '.main', '.content',
-            'header', 'footer', 'aside', 'main'
-        ]
-        
-        for selector in layout_selectors:
-            elements = soup.select(selector)
+        for selector in _LAYOUT_SELECTORS:
+            elements = index.select(selector)
             if elements:
                 patterns.append(ElementPattern(
                     pattern_type='structural',
@@ -328,18 +592,14 @@ class PatternDetector:
         
         return patterns
     
-    def _detect_component_patterns(self, soup: BeautifulSoup) -> List[ElementPattern]:
+    def _detect_component_patterns(self, index: DomIndex) -> List[ElementPattern]:
         """Detecta patrones de componentes"""
         patterns = []
         
         # Buscar elementos que se repiten con estructura similar
-        all_elements = soup.find_all()
-        element_counts = Counter([elem.name for elem in all_elements])
-        
-        for element_name, count in element_counts.items():
-            if count >= 3 and element_name not in ['div', 'span', 'p']:
-                elements = soup.find_all(element_name)
-                if self._has_similar_structure(elements):
+        for element_name, elements in index.by_tag.items():
+            if len(elements) >= 3 and element_name not in ['div', 'span', 'p']:
+                if self._has_similar_structure(elements, index):
                     patterns.append(ElementPattern(
                         pattern_type='structural',
                         elements=elements,
@@ -350,14 +610,14 @@ class PatternDetector:
         
         return patterns
     
-    def _detect_text_patterns(self, soup: BeautifulSoup) -> List[ElementPattern]:
+    def _detect_text_patterns(self, index: DomIndex) -> List[ElementPattern]:
         """Detecta patrones en texto"""
         patterns = []
         
         # Párrafos con estructura similar
-        paragraphs = soup.find_all('p')
+        paragraphs = index.tags('p')
         if len(paragraphs) >= 3:
-            text_lengths = [len(p.get_text(strip=True)) for p in paragraphs]
+            text_lengths = [len(_get_text(p)) for p in paragraphs]
             if self._is_consistent_pattern(text_lengths):
                 patterns.append(ElementPattern(
                     pattern_type='content',
@@ -369,20 +629,19 @@ class PatternDetector:
         
         return patterns
     
-    def _detect_link_patterns(self, soup: BeautifulSoup) -> List[ElementPattern]:
+    def _detect_link_patterns(self, index: DomIndex) -> List[ElementPattern]:
         """Detecta patrones en enlaces"""
         patterns = []
         
-        links = soup.find_all('a', href=True)
+        links = [link for link in index.tags('a') if 'href' in link.attrib]
         if len(links) >= 5:
             # Agrupar por dominio
             domains = defaultdict(list)
+            match_netloc = _NETLOC_RE.match
             for link in links:
-                href = link.get('href', '')
-                if href.startswith('http'):
-                    from urllib.parse import urlparse
-                    domain = urlparse(href).netloc
-                    domains[domain].append(link)
+                match = match_netloc(link.get('href', ''))
+                if match:
+                    domains[match.group(1)].append(link)
             
             # Patrones por dominio
             for domain, domain_links in domains.items():
@@ -397,11 +656,11 @@ class PatternDetector:
         
         return patterns
     
-    def _detect_image_patterns(self, soup: BeautifulSoup) -> List[ElementPattern]:
+    def _detect_image_patterns(self, index: DomIndex) -> List[ElementPattern]:
         """Detecta patrones en imágenes"""
         patterns = []
         
-        images = soup.find_all('img')
+        images = index.tags('img')
         if len(images) >= 3:
             # Verificar si tienen atributos similares
             alt_texts = [img.get('alt', '') for img in images]
@@ -421,40 +680,51 @@ class PatternDetector:
         if len(values) < 3:
             return False
         
-        # Verificar si los valores son similares en longitud o estructura
+        # Verificar si los valores son similares en longitud (textos) o en magnitud (números)
         if isinstance(values[0], str):
-            lengths = [len(v) for v in values]
-            avg_length = sum(lengths) / len(lengths)
-            return all(abs(len(v) - avg_length) < avg_length * 0.5 for v in values)
+            lengths = np.fromiter(map(len, values), dtype=np.int64, count=len(values))
+        elif isinstance(values[0], (int, float)):
+            lengths = np.asarray(values, dtype=np.float64)
+        else:
+            return False
         
-        return False
+        avg_length = lengths.mean()
+        if avg_length <= 0:
+            return False
+        return bool((np.abs(lengths - avg_length) < avg_length * 0.5).all())
     
-    def _has_similar_structure(self, elements: List[Tag]) -> bool:
+    def _has_similar_structure(self, elements: List[HtmlElement],
+                               index: Optional[DomIndex] = None) -> bool:
         """Verifica si elementos tienen estructura similar"""
         if len(elements) < 2:
             return False
         
-        # Comparar estructura básica
-        first_structure = self._get_element_structure(elements[0])
+        # Comparar estructura básica (memoizada en el índice si se proporciona)
+        cache = index.structures if index is not None else None
+        first_structure = self._get_element_structure(elements[0], cache)
         for element in elements[1:]:
-            if self._get_element_structure(element) != first_structure:
+            if self._get_element_structure(element, cache) != first_structure:
                 return False
         
         return True
     
-    def _get_element_structure(self, element: Tag) -> str:
-        """Obtiene la estructura básica de un elemento"""
-        structure = []
-        for child in element.children:
-            if hasattr(child, 'name'):
-                structure.append(child.name)
-        return ','.join(structure)
+    def _get_element_structure(self, element: HtmlElement,
+                               cache: Optional[Dict[int, Tuple[str, ...]]] = None) -> Tuple[str, ...]:
+        """Obtiene la estructura básica de un elemento (tupla de tags de sus hijos)"""
+        if cache is not None:
+            structure = cache.get(id(element))
+            if structure is not None:
+                return structure
+        structure = tuple(sys.intern(child.tag) for child in element.iterchildren(etree.Element))
+        if cache is not None:
+            cache[id(element)] = structure
+        return structure
     
     def _generate_suggestions(self, patterns: List[ElementPattern]) -> List[str]:
         """Genera sugerencias basadas en los patrones detectados"""
         suggestions = []
         
-        pattern_types = Counter([p.pattern_type for p in patterns])
+        pattern_types = Counter(p.pattern_type for p in patterns)
         
         if pattern_types['repetitive'] > 0:
             suggestions.append("Se detectaron elementos repetitivos. Considera usar CSS Grid o Flexbox.")
@@ -475,67 +745,101 @@ class ParallelProcessor:
     """Procesador paralelo para análisis HTML"""
     
     def __init__(self, max_workers: int = 4):
+        # El recorrido es Python puro y retiene el GIL: con hilos solo se
+        # añadía overhead, así que se procesa en línea.
+        # max_workers se conserva por compatibilidad.
         self.max_workers = max_workers
-        self.executor = ThreadPoolExecutor(max_workers=max_workers)
-        self.chunk_size = 1000
     
-    def process_html_chunks(self, html: str) -> List[Dict[str, Any]]:
-        """Procesa HTML en chunks para mejor rendimiento"""
-        soup = BeautifulSoup(html, 'lxml')
-        all_elements = soup.find_all()
+    def process_html_chunks(self, html: Union[str, HtmlElement]) -> List[Dict[str, Any]]:
+        """
+        Procesa HTML en chunks para mejor rendimiento
         
-        # Dividir elementos en chunks
-        chunks = [all_elements[i:i + self.chunk_size] 
-                 for i in range(0, len(all_elements), self.chunk_size)]
+        Args:
+            html: Contenido HTML o árbol ya parseado (se reutiliza sin volver a parsear)
+        """
+        root = _parse_html(html) if isinstance(html, (str, bytes)) else html
         
-        # Procesar chunks en paralelo
-        futures = []
-        for chunk in chunks:
-            future = self.executor.submit(self._process_chunk, chunk)
-            futures.append(future)
+        try:
+            return self._walk(root)
+        except Exception as e:
+            logger.error(f"Error procesando elementos: {e}")
+            return []
+    
+    def _walk(self, root: HtmlElement) -> List[Dict[str, Any]]:
+        """
+        Extrae las características de todos los elementos en un solo recorrido
         
-        # Recopilar resultados
-        results = []
-        for future in as_completed(futures):
-            try:
-                chunk_result = future.result()
-                results.extend(chunk_result)
-            except Exception as e:
-                logger.error(f"Error procesando chunk: {e}")
+        La profundidad se lleva al descender; text_length y children_count se
+        agregan de abajo hacia arriba al cerrar cada elemento, en lugar de
+        recorrer el subárbol de cada uno.
         
-        return results
-    
-    def _process_chunk(self, elements: List[Tag]) -> List[Dict[str, Any]]:
-        """Procesa un chunk de elementos"""
+        Se conservan los valores de la versión con BeautifulSoup: <html> tiene
+        profundidad 1 y el texto de script/style/template/rt/rp solo cuenta
+        para esa etiqueta, no para sus ancestros (ni para los elementos que
+        contiene, como hace get_text()).
+        """
         results = []
-        
-        for element in elements:
-            try:
+        # Pila de [resultado, longitud de texto acumulada, descendientes
+        # acumulados, contenedor de texto en vigor]
+        stack = []
+        depth = self._calculate_depth(root) + 1
+        
+        for event, element in etree.iterwalk(root, events=('start', 'end')):
+            if event == 'start':
+                tag = element.tag
+                if tag in _STRING_CONTAINER_TAGS:
+                    context = tag
+                else:
+                    context = stack[-1][3] if stack else None
                 result = {
-                    'tag': element.name,
-                    'attributes': dict(element.attrs),
-                    'text_length': len(element.get_text(strip=True)),
-                    'children_count': len(element.find_all()),
-                    'depth': self._calculate_depth(element)
+                    'tag': element.tag,
+                    # Vista de solo lectura (por convención) sobre los atributos
+                    # del elemento: no se copian a un dict por elemento
+                    'attributes': element.attrib,
+                    'text_length': 0,
+                    'children_count': 0,
+                    'depth': depth
                 }
                 results.append(result)
-            except Exception as e:
-                logger.warning(f"Error procesando elemento {element.name}: {e}")
+                stack.append([result, 0, 0, context])
+                depth += 1
+                continue
+            
+            depth -= 1
+            result, text_length, descendants, context = stack.pop()
+            # Mismo texto que itertext(): el propio, los subárboles y las colas
+            # de los hijos (incluidos comentarios), cada fragmento recortado
+            text = element.text
+            if text:
+                text_length += len(text.strip())
+            for child in element:
+                tail = child.tail
+                if tail:
+                    text_length += len(tail.strip())
+            # Dentro de un contenedor, los elementos normales no ven su texto
+            if context is None or context == element.tag:
+                result['text_length'] = text_length
+            result['children_count'] = descendants
+            
+            if stack:
+                parent = stack[-1]
+                if parent[3] == context:
+                    parent[1] += text_length
+                parent[2] += descendants + 1
         
         return results
     
-    def _calculate_depth(self, element: Tag) -> int:
+    def _calculate_depth(self, element: HtmlElement) -> int:
         """Calcula la profundidad de un elemento"""
         depth = 0
-        parent = element.parent
-        while parent and hasattr(parent, 'name'):
+        parent = element.getparent()
+        while parent is not None:
             depth += 1
-            parent = parent.parent
+            parent = parent.getparent()
         return depth
     
     def shutdown(self):
-        """Cierra el procesador paralelo"""
-        self.executor.shutdown(wait=True)
+        """Cierra el procesador paralelo (no mantiene recursos abiertos)"""
 
 
 class SmartHTMLAnalyzer:
@@ -554,6 +858,9 @@ class SmartHTMLAnalyzer:
         
         # Componentes
         self.cache = LRUCache(maxsize=1000)
+        # Resultados por bloque (hijos de <body> y <head>): un cambio en un
+        # bloque no obliga a recalcular los demás
+        self.block_cache = LRUCache(maxsize=5000)
         self.pattern_detector = PatternDetector()
         self.parallel_processor = ParallelProcessor()
         
@@ -584,7 +891,7 @@ class SmartHTMLAnalyzer:
         start_time = time.time()
         
         # Generar hash del HTML
-        html_hash = hashlib.md5(html.encode()).hexdigest()
+        html_hash = _hash_html(html)
         
         # Verificar cache
         if self.enable_cache:
@@ -608,29 +915,29 @@ class SmartHTMLAnalyzer:
         
         try:
             # Parse HTML
-            soup = BeautifulSoup(html, 'lxml')
+            root = _parse_html(html)
             
-            # Análisis paralelo de elementos
+            # Conteos aditivos por bloque (elementos analizados y scores)
+            counts = self._analyze_blocks(root)
             if self.enable_parallel:
-                element_results = self.parallel_processor.process_html_chunks(html)
-                analysis.elements_analyzed = len(element_results)
+                analysis.elements_analyzed = counts['elements']
             
             # Detección de patrones
             if self.enable_pattern_detection:
-                pattern_result = self.pattern_detector.detect_patterns(soup)
+                pattern_result = self.pattern_detector.detect_patterns(root)
                 analysis.patterns_detected = pattern_result.patterns
             
             # Análisis semántico
-            analysis.semantic_structure = self._analyze_semantic_structure(soup)
+            analysis.semantic_structure = self._analyze_semantic_structure(root)
             
             # Análisis de accesibilidad
-            analysis.accessibility_score = self._calculate_accessibility_score(soup)
+            analysis.accessibility_score = self._accessibility_score_from_counts(counts)
             
             # Análisis de rendimiento
-            analysis.performance_score = self._calculate_performance_score(soup)
+            analysis.performance_score = self._performance_score_from_counts(counts)
             
             # Detectar bloques de contenido
-            analysis.content_blocks = self._detect_content_blocks(soup)
+            analysis.content_blocks = self._detect_content_blocks(root, html)
             
             # Marcar como completo
             analysis.is_complete = True
@@ -638,7 +945,7 @@ class SmartHTMLAnalyzer:
             
             # Guardar en cache
             if self.enable_cache:
-                self.cache.set(html_hash, analysis)
+                self.cache.set(html_hash, analysis.to_cacheable())
             
             logger.info(f"Análisis incremental completado en {time.time() - start_time:.2f}s")
             
@@ -648,12 +955,12 @@ class SmartHTMLAnalyzer:
         
         return analysis
     
-    def detect_patterns(self, elements: List[Tag]) -> PatternResult:
+    def detect_patterns(self, elements: List[Any]) -> PatternResult:
         """
         Detecta patrones en una lista de elementos
         
         Args:
-            elements: Lista de elementos HTML
+            elements: Lista de elementos HTML (lxml o cualquier objeto cuyo str() sea HTML)
             
         Returns:
             PatternResult con patrones detectados
@@ -661,13 +968,16 @@ class SmartHTMLAnalyzer:
         if not self.enable_pattern_detection:
             return PatternResult([], 0, 0.0, [])
         
-        # Crear un soup temporal para el análisis
-        temp_html = f"<html>{''.join(str(elem) for elem in elements)}</html>"
-        soup = BeautifulSoup(temp_html, 'lxml')
+        # Crear un documento temporal para el análisis
+        fragments = (
+            etree.tostring(elem, encoding='unicode') if isinstance(elem, etree._Element) else str(elem)
+            for elem in elements
+        )
+        root = _parse_html(f"<html>{''.join(fragments)}</html>")
         
-        return self.pattern_detector.detect_patterns(soup)
+        return self.pattern_detector.detect_patterns(root)
     
-    def _analyze_semantic_structure(self, soup: BeautifulSoup) -> Dict[str, Any]:
+    def _analyze_semantic_structure(self, root: HtmlElement) -> Dict[str, Any]:
         """Analiza la estructura semántica del HTML"""
         structure = {
             'headings': [],
@@ -680,96 +990,134 @@ class SmartHTMLAnalyzer:
         
         # Headings
         for i in range(1, 7):
-            headings = soup.find_all(f'h{i}')
-            structure['headings'].extend([{
+            headings = root.iter(f'h{i}')
+            structure['headings'].extend({
                 'level': i,
-                'text': h.get_text(strip=True),
+                'text': _get_text(h),
                 'id': h.get('id', '')
-            } for h in headings])
+            } for h in headings)
         
         # Sections
-        sections = soup.find_all(['section', 'article', 'aside', 'nav'])
+        sections = root.iter('section', 'article', 'aside', 'nav')
         structure['sections'] = [{
-            'tag': s.name,
+            'tag': s.tag,
             'id': s.get('id', ''),
-            'class': s.get('class', [])
+            'class': s.get('class', '').split()
         } for s in sections]
         
         # Forms
-        forms = soup.find_all('form')
+        forms = root.iter('form')
         structure['forms'] = [{
             'action': f.get('action', ''),
             'method': f.get('method', 'get'),
-            'inputs': len(f.find_all('input'))
+            'inputs': int(_COUNT_INPUTS(f))
         } for f in forms]
         
         # Tables
-        tables = soup.find_all('table')
+        tables = root.iter('table')
         structure['tables'] = [{
-            'rows': len(t.find_all('tr')),
-            'headers': len(t.find_all('th'))
+            'rows': int(_COUNT_ROWS(t)),
+            'headers': int(_COUNT_HEADERS(t))
         } for t in tables]
         
         return structure
     
-    def _calculate_accessibility_score(self, soup: BeautifulSoup) -> float:
+    def _analyze_blocks(self, root: HtmlElement) -> Counter:
+        """
+        Suma los conteos aditivos de cada bloque de primer nivel
+        
+        Los bloques son <head> y los hijos de <body>; cada uno se identifica por
+        el hash de su HTML y se reutiliza desde block_cache si no ha cambiado.
+        <html> y <body> se cuentan aparte porque envuelven a todos los bloques.
+        """
+        totals = Counter()
+        blocks = []
+        for shell in (root, root.find('body')):
+            if shell is None:
+                continue
+            totals['elements'] += 1
+            if 'style' in shell.attrib:
+                totals['styled_elements'] += 1
+            blocks.extend(child for child in shell.iterchildren(etree.Element)
+                          if child.tag != 'body')
+        
+        for block in blocks:
+            block_hash = ''
+            cached = None
+            if self.enable_cache:
+                block_hash = _hash_html(etree.tostring(block, with_tail=False))
+                cached = self.block_cache.get(block_hash)
+            if cached is None:
+                counts = _count_all(block)
+                if self.enable_parallel:
+                    counts['elements'] = len(self.parallel_processor.process_html_chunks(block))
+                cached = BlockAnalysis(block_hash=block_hash, counts=counts)
+                if self.enable_cache:
+                    self.block_cache.set(block_hash, cached)
+            totals.update(cached.counts)
+        
+        return totals
+    
+    def _calculate_accessibility_score(self, root: HtmlElement) -> float:
         """Calcula el score de accesibilidad"""
+        return self._accessibility_score_from_counts(_count_all(root))
+    
+    def _accessibility_score_from_counts(self, counts: Dict[str, int]) -> float:
+        """Score de accesibilidad a partir de los conteos de _COUNT_XPATHS"""
+        total_checks = counts['images'] + counts['links'] + counts['inputs']
+        if total_checks == 0:
+            return 100.0
+        
         score = 100.0
-        total_checks = 0
         
         # Imágenes sin alt
-        images = soup.find_all('img')
-        for img in images:
-            total_checks += 1
-            if not img.get('alt'):
-                score -= 5
+        score -= 5 * counts['images_without_alt']
         
         # Enlaces sin texto
-        links = soup.find_all('a')
-        for link in links:
-            total_checks += 1
-            if not link.get_text(strip=True):
-                score -= 3
+        score -= 3 * counts['links_without_text']
         
         # Formularios sin labels
-        inputs = soup.find_all('input')
-        for inp in inputs:
-            total_checks += 1
-            if not inp.get('id') and not inp.get('aria-label'):
-                score -= 2
+        score -= 2 * counts['inputs_without_label']
         
-        return max(0.0, score) if total_checks > 0 else 100.0
+        return max(0.0, score)
     
-    def _calculate_performance_score(self, soup: BeautifulSoup) -> float:
+    def _calculate_performance_score(self, root: HtmlElement) -> float:
         """Calcula el score de rendimiento"""
+        return self._performance_score_from_counts(_count_all(root))
+    
+    def _performance_score_from_counts(self, counts: Dict[str, int]) -> float:
+        """Score de rendimiento a partir de los conteos de _COUNT_XPATHS"""
         score = 100.0
         
         # Imágenes sin optimizar
-        images = soup.find_all('img')
-        for img in images:
-            if not img.get('loading') == 'lazy':
-                score -= 1
+        score -= counts['images_not_lazy']
         
         # Scripts bloqueantes
-        scripts = soup.find_all('script')
-        for script in scripts:
-            if not script.get('async') and not script.get('defer'):
-                score -= 2
+        score -= 2 * counts['blocking_scripts']
         
         # CSS inline excesivo
-        elements_with_style = soup.find_all(attrs={'style': True})
-        if len(elements_with_style) > 10:
+        if counts['styled_elements'] > 10:
             score -= 5
         
         return max(0.0, score)
     
-    def _detect_content_blocks(self, soup: BeautifulSoup) -> List[Dict[str, Any]]:
-        """Detecta bloques de contenido principales"""
+    def _detect_content_blocks(self, root: HtmlElement,
+                               raw_html: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Detecta bloques de contenido principales
+        
+        Args:
+            root: Árbol ya parseado
+            raw_html: HTML original; si se da, readability lo usa directamente
+                en lugar de serializar el árbol de nuevo
+        """
         blocks = []
         
         # Usar readability para detectar contenido principal
         try:
-            doc = Document(str(soup))
+            if raw_html is None:
+                raw_html = lxml.html.tostring(root, encoding='unicode')
+            doc = Document(raw_html)
             main_content = doc.summary()
             
             if main_content:
@@ -783,16 +1131,9 @@ class SmartHTMLAnalyzer:
             logger.warning(f"Error usando readability: {e}")
         
         # Detectar otros bloques importantes
-        important_selectors = [
-            'main', 'article', '.content', '.main', '.post',
-            'nav', '.navigation', '.menu',
-            'aside', '.sidebar', '.widget'
-        ]
-        
-        for selector in important_selectors:
-            elements = soup.select(selector)
-            for element in elements:
-                text = element.get_text(strip=True)
+        for selector, compiled in _CONTENT_BLOCK_SELECTORS:
+            for element in compiled(root):
+                text = _get_text(element)
                 if len(text) > 50:  # Solo bloques con contenido significativo
                     blocks.append({
                         'type': selector,
@@ -810,6 +1151,7 @@ class SmartHTMLAnalyzer:
     def clear_cache(self):
         """Limpia el cache"""
         self.cache.clear()
+        self.block_cache.clear()
     
     def shutdown(self):
         """Cierra el analizador"""
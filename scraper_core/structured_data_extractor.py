@@ -5,20 +5,325 @@ Extracts structured data from web pages including JSON-LD, Microdata, RDFa,
 Open Graph, Twitter Cards, and custom selectors with validation and cleaning.
 """
 
+import html
 import json
 import logging
-from typing import Dict, List, Any, Optional, Union, Tuple
-from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Any, NamedTuple, Optional, Union, Tuple
+from dataclasses import dataclass, field, asdict, is_dataclass
+from datetime import datetime
+from functools import lru_cache
 from urllib.parse import urljoin, urlparse
 import re
-from bs4 import BeautifulSoup, Tag
+import sys
+from itertools import repeat
+import lxml.etree as etree
+import lxml.html
+from lxml.cssselect import LxmlHTMLTranslator
+from lxml.html import HtmlElement
 import extruct
-import validators
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+try:
+    import validators
+    VALIDATORS_AVAILABLE = True
+except ImportError:
+    VALIDATORS_AVAILABLE = False
 
 logger = logging.getLogger(__name__)
 
+# JSON-LD payloads are parsed with orjson when available; its
+# JSONDecodeError subclasses json.JSONDecodeError
+_json_loads = orjson.loads if ORJSON_AVAILABLE else json.loads
+
+# Export encoders, backed by orjson when available. orjson serializes the
+# item dataclasses itself, so the JSON export needs no asdict() copy of each
+if ORJSON_AVAILABLE:
+    def _json_dumps_pretty(obj: Any) -> bytes:
+        return orjson.dumps(obj, default=str, option=orjson.OPT_INDENT_2)
+    
+    def _json_dumps_compact(obj: Any) -> str:
+        return orjson.dumps(obj, default=str).decode()
+else:
+    def _export_default(obj: Any) -> Any:
+        return asdict(obj) if is_dataclass(obj) else str(obj)
+    
+    def _json_dumps_pretty(obj: Any) -> bytes:
+        return json.dumps(obj, indent=2, default=_export_default).encode('utf-8')
+    
+    def _json_dumps_compact(obj: Any) -> str:
+        return json.dumps(obj, ensure_ascii=False)
+
+# dataclass(slots=True) is only available on Python 3.10+
+_DATACLASS_SLOTS = {'slots': True} if sys.version_info >= (3, 10) else {}
+
+# Precompiled XPath queries for the properties under a microdata/RDFa root
+_XP_ITEMPROP = etree.XPath("descendant::*[@itemprop]")
+_XP_PROPERTY = etree.XPath("descendant::*[@property]")
+# Substrings the raw markup must contain for a pass to match anything
+_JSONLD_MARKER = 'application/ld+json'
+_OPENGRAPH_MARKER = 'og:'
+_TWITTER_MARKER = 'twitter:'
+_MICRODATA_MARKER = 'itemtype'
+_RDFA_MARKER = 'typeof'
+_MICROFORMAT_MARKER = 'h-'
+
+# Root microformat classes, in the order their items are reported
+_MICROFORMAT_CLASSES = ('h-card', 'h-entry', 'h-event', 'h-product', 'h-recipe', 'h-review')
+
+# Selector strings recorded on items, shared instead of rebuilt per item
+_JSONLD_SELECTOR = "script[type='application/ld+json']"
+_OPENGRAPH_SELECTOR = 'meta[property^="og:"]'
+_TWITTER_SELECTOR = 'meta[name^="twitter:"]'
+# Item type ('h-card' -> 'Card') and selector for each microformat class
+_MICROFORMAT_ITEM_TYPES = {
+    class_name: (class_name[2:].title(), f".{class_name}") for class_name in _MICROFORMAT_CLASSES
+}
+
+_CSS_TRANSLATOR = LxmlHTMLTranslator()
+
+_WHITESPACE_RE = re.compile(r'\s+')
+# Complete character references only: html.unescape() alone also decodes
+# legacy names without a semicolon, turning '&region=' into '®ion='
+_ENTITY_RE = re.compile(r'&(?:#\d+|#[xX][0-9a-fA-F]+|\w+);')
+
+
+def _unescape_entity(match: 're.Match[str]') -> str:
+    """Decode one complete character reference matched by _ENTITY_RE"""
+    return html.unescape(match.group())
+
+# Absolute http(s) URL check used during validation; validators.url is much
+# slower and only used when strict_url_validation is enabled
+_URL_RE = re.compile(r'^https?://[^\s/$.?#].[^\s]*$', re.IGNORECASE)
+
+
+def _is_http_url(value: str) -> bool:
+    """Check an absolute http(s) URL, rejecting empty and non-'h' strings before the regex"""
+    return value[:1] in ('h', 'H') and _URL_RE.match(value) is not None
+
+# Substrings of field names that suggest the value is a URL
+_URL_INDICATORS = ('url', 'href', 'src', 'link', 'image', 'photo', 'logo', 'icon')
+
+
+class _MicroformatProperty(NamedTuple):
+    """A property class inside a microformat root and the key it is stored under"""
+    class_name: str
+    key: str
+    attribute: Optional[str] = None  # Preferred over the text when present
+    multiple: bool = False           # Collect every match instead of the first
+
+
+_MICROFORMAT_PROPERTIES = {
+    'h-card': (
+        _MicroformatProperty('p-name', 'name'),
+        _MicroformatProperty('u-url', 'url', attribute='href'),
+        _MicroformatProperty('u-photo', 'photo', attribute='src'),
+        _MicroformatProperty('p-org', 'organization'),
+    ),
+    'h-entry': (
+        _MicroformatProperty('p-name', 'title'),
+        _MicroformatProperty('e-content', 'content'),
+        _MicroformatProperty('dt-published', 'published'),
+        _MicroformatProperty('p-author', 'author'),
+    ),
+    'h-event': (
+        _MicroformatProperty('p-name', 'name'),
+        _MicroformatProperty('dt-start', 'start'),
+        _MicroformatProperty('dt-end', 'end'),
+        _MicroformatProperty('p-location', 'location'),
+    ),
+    'h-product': (
+        _MicroformatProperty('p-name', 'name'),
+        _MicroformatProperty('p-price', 'price'),
+        _MicroformatProperty('p-brand', 'brand'),
+        _MicroformatProperty('p-category', 'category'),
+    ),
+    'h-recipe': (
+        _MicroformatProperty('p-name', 'name'),
+        _MicroformatProperty('p-ingredient', 'ingredients', multiple=True),
+        _MicroformatProperty('e-instructions', 'instructions', multiple=True),
+        _MicroformatProperty('dt-duration', 'cooking_time'),
+    ),
+    'h-review': (
+        _MicroformatProperty('p-item', 'item'),
+        _MicroformatProperty('p-rating', 'rating'),
+        _MicroformatProperty('e-content', 'content'),
+        _MicroformatProperty('p-reviewer', 'reviewer'),
+    ),
+}
 
-@dataclass
+
+@lru_cache(maxsize=256)
+def _base_scheme(base_url: str) -> str:
+    """Scheme of a page URL; cached since every URL on a page shares its base"""
+    return urlparse(base_url).scheme
+
+
+class _DocumentScan(NamedTuple):
+    """Root elements for every extraction pass, collected in one tree walk"""
+    json_ld: List[HtmlElement]
+    opengraph: List[HtmlElement]
+    twitter: List[HtmlElement]
+    microdata: List[HtmlElement]
+    rdfa: List[HtmlElement]
+    microformats: Dict[str, List[HtmlElement]]
+
+
+def _scan_document(tree: HtmlElement, roots: bool = True) -> _DocumentScan:
+    """
+    Bucket the elements each extractor needs, keeping document order
+    
+    Script and meta tags come from a tag-filtered walk that lxml runs in C
+    without handing other elements to Python. Microdata, RDFa and microformat
+    roots are recognised by attribute alone and need a walk over every
+    element, which is skipped when roots is False.
+    """
+    scan = _DocumentScan([], [], [], [], [], {class_name: [] for class_name in _MICROFORMAT_CLASSES})
+    
+    for element in tree.iter('script', 'meta'):
+        attrib = element.attrib
+        if element.tag == 'script':
+            if attrib.get('type') == 'application/ld+json':
+                scan.json_ld.append(element)
+        else:
+            # A tag may carry both an og: property and a twitter: name
+            if attrib.get('property', '').startswith('og:'):
+                scan.opengraph.append(element)
+            if attrib.get('name', '').startswith('twitter:'):
+                scan.twitter.append(element)
+    
+    if not roots:
+        return scan
+    
+    microformats = scan.microformats
+    for element in tree.iter(etree.Element):
+        attrib = element.attrib
+        if not attrib:
+            continue
+        
+        if 'itemtype' in attrib:
+            scan.microdata.append(element)
+        if 'typeof' in attrib:
+            scan.rdfa.append(element)
+        
+        classes = attrib.get('class')
+        if classes:
+            for class_name in classes.split():
+                bucket = microformats.get(class_name)
+                # Skip a class repeated on the same element
+                if bucket is not None and (not bucket or bucket[-1] is not element):
+                    bucket.append(element)
+    
+    return scan
+
+
+@lru_cache(maxsize=256)
+def _microdata_type(itemtype: str) -> Tuple[str, str]:
+    """Item type and selector for an itemtype URL; repeated types share the same strings"""
+    return itemtype.split('/')[-1], f"[itemtype='{itemtype}']"
+
+
+@lru_cache(maxsize=256)
+def _rdfa_type(typeof: str) -> Tuple[str, str]:
+    """Item type and selector for an RDFa typeof; repeated types share the same strings"""
+    return typeof.split(':')[-1], f"[typeof='{typeof}']"
+
+
+def _build_nested(pairs: List[Tuple[List[str], str]]) -> Dict[str, Any]:
+    """
+    Assemble split meta property names, e.g. ['image', 'width'], into nested dicts
+    
+    A structured property such as og:image:width usually sits next to the plain
+    og:image value. Whichever comes first, the plain value is kept under 'url',
+    the key Open Graph defines for it (og:image:url).
+    """
+    data = {}
+    
+    for parts, content in pairs:
+        current = data
+        # Plain properties (og:title) go straight into the top level
+        if len(parts) > 1:
+            for part in parts[:-1]:
+                child = current.get(part)
+                if not isinstance(child, dict):
+                    child = current[part] = {} if child is None else {'url': child}
+                current = child
+        
+        last = parts[-1]
+        existing = current.get(last)
+        if isinstance(existing, dict):
+            existing['url'] = content
+        else:
+            current[last] = content
+    
+    return data
+
+
+def _container_items(obj: Any):
+    """(key, value) pairs of a dict, or (None, item) pairs of a list"""
+    if isinstance(obj, dict):
+        return iter(obj.items())
+    return zip(repeat(None), obj)
+
+
+def _walk_urls(data: Union[Dict[str, Any], List[Any]], errors: List[str],
+               is_url_field: Callable[[str], bool], is_valid_url: Callable[[str], Any],
+               scheme: str = 'https') -> None:
+    """
+    Append an error to errors for every URL-like field holding an invalid URL
+    
+    Nested dicts and lists are walked with a stack of iterators instead of
+    recursion, so fields are still checked (and reported) in document order.
+    Protocol-relative values ('//cdn.example.com/a.png') are checked with the
+    given scheme.
+    """
+    stack = [_container_items(data)]
+    while stack:
+        for key, value in stack[-1]:
+            if isinstance(value, str):
+                if key is not None and is_url_field(key):
+                    url = f"{scheme}:{value}" if value.startswith('//') else value
+                    if not is_valid_url(url):
+                        errors.append(f"Invalid URL in field '{key}': {value}")
+            elif isinstance(value, (dict, list)):
+                # Finish the nested container before the remaining siblings
+                stack.append(_container_items(value))
+                break
+        else:
+            stack.pop()
+
+
+def _parse_html(html_content: Union[str, bytes]) -> HtmlElement:
+    """Parse a full HTML document with lxml"""
+    try:
+        return lxml.html.document_fromstring(html_content)
+    except ValueError:
+        # lxml rejects str input that carries an XML encoding declaration
+        return lxml.html.document_fromstring(html_content.encode('utf-8'))
+    except etree.ParserError:
+        # Empty or whitespace-only documents
+        return lxml.html.document_fromstring('<html></html>')
+
+
+def _get_text(element: HtmlElement) -> str:
+    """Text of an element with every fragment stripped, like get_text(strip=True)"""
+    if not len(element):
+        # Leaf elements (most property values) hold a single text node
+        text = element.text
+        return text.strip() if text else ''
+    return ''.join(text.strip() for text in element.itertext())
+
+
+def _compile_css(selector: str) -> etree.XPath:
+    """Compile a CSS selector into an XPath that matches the descendants of an element"""
+    return etree.XPath(_CSS_TRANSLATOR.css_to_xpath(selector, prefix='descendant::'))
+
+
+@dataclass(**_DATACLASS_SLOTS)
 class StructuredDataItem:
     """Represents a structured data item"""
     type: str
@@ -30,7 +335,7 @@ class StructuredDataItem:
     validation_errors: List[str] = field(default_factory=list)
 
 
-@dataclass
+@dataclass(**_DATACLASS_SLOTS)
 class ExtractionResult:
     """Result of structured data extraction"""
     items: List[StructuredDataItem] = field(default_factory=list)
@@ -74,9 +379,19 @@ class StructuredDataExtractor:
         self.validate_data = extractor_config.get('validate_data', True)
         self.clean_data = extractor_config.get('clean_data', True)
         self.normalize_urls = extractor_config.get('normalize_urls', True)
+        self.strict_url_validation = extractor_config.get('strict_url_validation', False)
+        if self.strict_url_validation and not VALIDATORS_AVAILABLE:
+            logger.warning("validators not installed, strict URL validation disabled")
+            self.strict_url_validation = False
+        
+        # Optional JSON-LD @type allowlist: other types are dropped, and
+        # scripts that mention none of the listed types are never parsed
+        type_allowlist = extractor_config.get('type_allowlist')
+        self.type_allowlist = frozenset(type_allowlist) if type_allowlist else None
         
-        # Custom selectors
+        # Custom selectors, compiled once instead of on every page
         self.custom_selectors = extractor_config.get('custom_selectors', {})
+        self._compiled_selectors = self._compile_custom_selectors(self.custom_selectors)
         
         # Initialize extractors - using extruct's unified API
         self.extractors = {
@@ -89,12 +404,13 @@ class StructuredDataExtractor:
         
         logger.info("Structured data extractor initialized")
     
-    def extract_all(self, html_content: str, url: str) -> ExtractionResult:
+    def extract_all(self, html_content: Union[str, bytes, HtmlElement], url: str) -> ExtractionResult:
         """
         Extract all types of structured data from HTML content
         
         Args:
-            html_content: HTML content to extract from
+            html_content: HTML content to extract from, or an already parsed
+                lxml document so callers that hold a tree skip a second parse
             url: Base URL for normalization
             
         Returns:
@@ -107,27 +423,72 @@ class StructuredDataExtractor:
         start_time = time.time()
         
         result = ExtractionResult()
-        soup = BeautifulSoup(html_content, 'lxml')
+        
+        run_json_ld = self.extract_json_ld
+        run_opengraph = self.extract_opengraph
+        run_twitter = self.extract_twitter
+        run_microdata = self.extract_microdata
+        run_rdfa = self.extract_rdfa
+        run_microformats = self.extract_microformats
+        if isinstance(html_content, str):
+            # A substring check on the raw markup is far cheaper than a
+            # tree walk and rules out passes that cannot match anything
+            run_json_ld = run_json_ld and _JSONLD_MARKER in html_content
+            run_opengraph = run_opengraph and _OPENGRAPH_MARKER in html_content
+            run_twitter = run_twitter and _TWITTER_MARKER in html_content
+            run_microdata = run_microdata and _MICRODATA_MARKER in html_content
+            run_rdfa = run_rdfa and _RDFA_MARKER in html_content
+            run_microformats = run_microformats and _MICROFORMAT_MARKER in html_content
+        # Only the attribute-based passes need the walk over every element
+        needs_roots = run_microdata or run_rdfa or run_microformats
+        needs_scan = run_json_ld or run_opengraph or run_twitter or needs_roots
+        
+        # Pages without any marker and no custom selectors are never parsed
+        tree = None
+        if isinstance(html_content, HtmlElement):
+            tree = html_content
+        elif needs_scan or self.custom_selectors:
+            tree = _parse_html(html_content)
         
         try:
-            # Extract JSON-LD
-            if self.extract_json_ld:
-                jsonld_items = self._extract_json_ld(soup, url)
-                result.items.extend(jsonld_items)
-            
-            # Extract Open Graph
-            if self.extract_opengraph:
-                opengraph_items = self._extract_opengraph(soup, url)
-                result.items.extend(opengraph_items)
-            
-            # Extract Twitter Cards
-            if self.extract_twitter:
-                twitter_items = self._extract_twitter_cards(soup, url)
-                result.items.extend(twitter_items)
+            if needs_scan:
+                # Collect the elements for every pass in one scan
+                scan = _scan_document(tree, roots=needs_roots)
+                
+                # Extract JSON-LD
+                if run_json_ld:
+                    jsonld_items = self._extract_json_ld(scan.json_ld, url)
+                    result.items.extend(jsonld_items)
+                
+                # Extract Microdata
+                if run_microdata:
+                    microdata_items = self._extract_microdata(scan.microdata, url)
+                    result.items.extend(microdata_items)
+                
+                # Extract RDFa
+                if run_rdfa:
+                    rdfa_items = self._extract_rdfa(scan.rdfa, url)
+                    result.items.extend(rdfa_items)
+                
+                # Extract Open Graph
+                if run_opengraph:
+                    opengraph_items = self._extract_opengraph(scan.opengraph, url)
+                    result.items.extend(opengraph_items)
+                
+                # Extract Twitter Cards
+                if run_twitter:
+                    twitter_items = self._extract_twitter_cards(scan.twitter, url)
+                    result.items.extend(twitter_items)
+                
+                # Extract Microformats
+                if run_microformats:
+                    microformat_items = self._extract_microformats(scan.microformats, url)
+                    result.items.extend(microformat_items)
             
             # Extract custom selectors
-            custom_items = self._extract_custom_selectors(soup, url)
-            result.items.extend(custom_items)
+            if self.custom_selectors:
+                custom_items = self._extract_custom_selectors(tree, url)
+                result.items.extend(custom_items)
             
             # Process and clean data
             if self.clean_data:
@@ -151,36 +512,41 @@ class StructuredDataExtractor:
         
         return result
     
-    def _extract_json_ld(self, soup: BeautifulSoup, url: str) -> List[StructuredDataItem]:
-        """Extract JSON-LD structured data"""
+    def _extract_json_ld(self, script_tags: List[HtmlElement], url: str) -> List[StructuredDataItem]:
+        """Extract JSON-LD structured data from script[type='application/ld+json'] tags"""
         items = []
+        type_allowlist = self.type_allowlist
         
         try:
-            # Find all script tags with type application/ld+json
-            script_tags = soup.find_all('script', type='application/ld+json')
-            
             for script in script_tags:
+                text = script.text
+                if not text:
+                    continue
+                
+                # A substring scan is far cheaper than parsing a script
+                # that cannot contain any wanted type
+                if type_allowlist and not any(item_type in text for item_type in type_allowlist):
+                    continue
+                
                 try:
-                    json_data = json.loads(script.string)
+                    json_data = _json_loads(text)
                     
                     # Handle both single objects and arrays
-                    if isinstance(json_data, list):
-                        for item in json_data:
-                            if isinstance(item, dict):
-                                items.append(StructuredDataItem(
-                                    type=item.get('@type', 'Unknown'),
-                                    data=item,
-                                    source='json-ld',
-                                    url=url,
-                                    selector=f"script[type='application/ld+json']"
-                                ))
-                    elif isinstance(json_data, dict):
+                    objects = json_data if isinstance(json_data, list) else [json_data]
+                    for item in objects:
+                        if not isinstance(item, dict):
+                            continue
+                        
+                        item_type = item.get('@type', 'Unknown')
+                        if type_allowlist and not self._is_allowed_type(item_type):
+                            continue
+                        
                         items.append(StructuredDataItem(
-                            type=json_data.get('@type', 'Unknown'),
-                            data=json_data,
+                            type=item_type,
+                            data=item,
                             source='json-ld',
                             url=url,
-                            selector=f"script[type='application/ld+json']"
+                            selector=_JSONLD_SELECTOR
                         ))
                         
                 except json.JSONDecodeError as e:
@@ -192,21 +558,23 @@ class StructuredDataExtractor:
         
         return items
     
-    def _extract_microdata(self, soup: BeautifulSoup, url: str) -> List[StructuredDataItem]:
-        """Extract Microdata structured data"""
+    def _is_allowed_type(self, item_type: Any) -> bool:
+        """Check a JSON-LD @type, a string or a list of strings, against the allowlist"""
+        item_types = item_type if isinstance(item_type, list) else [item_type]
+        return any(isinstance(t, str) and t in self.type_allowlist for t in item_types)
+    
+    def _extract_microdata(self, microdata_elements: List[HtmlElement], url: str) -> List[StructuredDataItem]:
+        """Extract Microdata structured data from elements with an itemtype attribute"""
         items = []
         
         try:
-            # Find elements with itemtype attribute
-            microdata_elements = soup.find_all(attrs={'itemtype': True})
-            
             for element in microdata_elements:
                 try:
                     itemtype = element.get('itemtype', '')
                     item_data = {}
                     
                     # Extract item properties
-                    for prop_element in element.find_all(attrs={'itemprop': True}):
+                    for prop_element in _XP_ITEMPROP(element):
                         prop_name = prop_element.get('itemprop')
                         prop_value = self._extract_property_value(prop_element)
                         
@@ -214,12 +582,13 @@ class StructuredDataExtractor:
                             item_data[prop_name] = prop_value
                     
                     if item_data:
+                        item_type, selector = _microdata_type(itemtype)
                         items.append(StructuredDataItem(
-                            type=itemtype.split('/')[-1] if '/' in itemtype else itemtype,
+                            type=item_type,
                             data=item_data,
                             source='microdata',
                             url=url,
-                            selector=f"[itemtype='{itemtype}']"
+                            selector=selector
                         ))
                         
                 except Exception as e:
@@ -231,21 +600,18 @@ class StructuredDataExtractor:
         
         return items
     
-    def _extract_rdfa(self, soup: BeautifulSoup, url: str) -> List[StructuredDataItem]:
-        """Extract RDFa structured data"""
+    def _extract_rdfa(self, rdfa_elements: List[HtmlElement], url: str) -> List[StructuredDataItem]:
+        """Extract RDFa structured data from elements with a typeof attribute"""
         items = []
         
         try:
-            # Find elements with typeof attribute
-            rdfa_elements = soup.find_all(attrs={'typeof': True})
-            
             for element in rdfa_elements:
                 try:
                     typeof = element.get('typeof', '')
                     item_data = {}
                     
                     # Extract properties
-                    for prop_element in element.find_all(attrs={'property': True}):
+                    for prop_element in _XP_PROPERTY(element):
                         prop_name = prop_element.get('property')
                         prop_value = self._extract_property_value(prop_element)
                         
@@ -259,12 +625,13 @@ class StructuredDataExtractor:
                             item_data[attr] = value
                     
                     if item_data:
+                        item_type, selector = _rdfa_type(typeof)
                         items.append(StructuredDataItem(
-                            type=typeof.split(':')[-1] if ':' in typeof else typeof,
+                            type=item_type,
                             data=item_data,
                             source='rdfa',
                             url=url,
-                            selector=f"[typeof='{typeof}']"
+                            selector=selector
                         ))
                         
                 except Exception as e:
@@ -276,35 +643,24 @@ class StructuredDataExtractor:
         
         return items
     
-    def _extract_opengraph(self, soup: BeautifulSoup, url: str) -> List[StructuredDataItem]:
-        """Extract Open Graph structured data"""
+    def _extract_opengraph(self, og_tags: List[HtmlElement], url: str) -> List[StructuredDataItem]:
+        """Extract Open Graph structured data from meta[property^="og:"] tags"""
         items = []
         
         try:
-            og_data = {}
-            
-            # Find all Open Graph meta tags
-            og_tags = soup.find_all('meta', property=re.compile(r'^og:'))
+            pairs = []
             
             for tag in og_tags:
-                property_name = tag.get('property', '')
-                content = tag.get('content', '')
+                attrib = tag.attrib
+                property_name = attrib.get('property')
+                content = attrib.get('content')
                 
                 if property_name and content:
-                    # Convert og:property:name to nested structure
-                    parts = property_name.split(':')
-                    if len(parts) >= 2:
-                        if len(parts) == 2:
-                            if isinstance(og_data, dict):
-                                og_data[parts[1]] = content
-                        else:
-                            # Handle nested properties like og:image:width
-                            current = og_data
-                            for part in parts[1:-1]:
-                                if part not in current:
-                                    current[part] = {}
-                                current = current[part]
-                            current[parts[-1]] = content
+                    # og:image:width -> ['image', 'width']
+                    pairs.append((property_name.split(':')[1:], content))
+            
+            # Convert og:property:name to nested structure
+            og_data = _build_nested(pairs)
             
             if og_data:
                 items.append(StructuredDataItem(
@@ -312,7 +668,7 @@ class StructuredDataExtractor:
                     data=og_data,
                     source='opengraph',
                     url=url,
-                    selector='meta[property^="og:"]'
+                    selector=_OPENGRAPH_SELECTOR
                 ))
                 
         except Exception as e:
@@ -320,34 +676,24 @@ class StructuredDataExtractor:
         
         return items
     
-    def _extract_twitter_cards(self, soup: BeautifulSoup, url: str) -> List[StructuredDataItem]:
-        """Extract Twitter Cards structured data"""
+    def _extract_twitter_cards(self, twitter_tags: List[HtmlElement], url: str) -> List[StructuredDataItem]:
+        """Extract Twitter Cards structured data from meta[name^="twitter:"] tags"""
         items = []
         
         try:
-            twitter_data = {}
-            
-            # Find all Twitter Card meta tags
-            twitter_tags = soup.find_all('meta', attrs={'name': re.compile(r'^twitter:')})
+            pairs = []
             
             for tag in twitter_tags:
-                name = tag.get('name', '')
-                content = tag.get('content', '')
+                attrib = tag.attrib
+                name = attrib.get('name')
+                content = attrib.get('content')
                 
                 if name and content:
-                    # Convert twitter:property to nested structure
-                    parts = name.split(':')
-                    if len(parts) >= 2:
-                        if len(parts) == 2:
-                            twitter_data[parts[1]] = content
-                        else:
-                            # Handle nested properties
-                            current = twitter_data
-                            for part in parts[1:-1]:
-                                if part not in current:
-                                    current[part] = {}
-                                current = current[part]
-                            current[parts[-1]] = content
+                    # twitter:image:alt -> ['image', 'alt']
+                    pairs.append((name.split(':')[1:], content))
+            
+            # Convert twitter:property to nested structure
+            twitter_data = _build_nested(pairs)
             
             if twitter_data:
                 items.append(StructuredDataItem(
@@ -355,7 +701,7 @@ class StructuredDataExtractor:
                     data=twitter_data,
                     source='twitter',
                     url=url,
-                    selector='meta[name^="twitter:"]'
+                    selector=_TWITTER_SELECTOR
                 ))
                 
         except Exception as e:
@@ -363,42 +709,25 @@ class StructuredDataExtractor:
         
         return items
     
-    def _extract_microformats(self, soup: BeautifulSoup, url: str) -> List[StructuredDataItem]:
-        """Extract Microformats structured data"""
+    def _extract_microformats(self, elements_by_class: Dict[str, List[HtmlElement]], url: str) -> List[StructuredDataItem]:
+        """Extract Microformats structured data from root elements grouped by h-* class"""
         items = []
         
         try:
-            # Find elements with microformat classes
-            microformat_classes = ['h-card', 'h-entry', 'h-event', 'h-product', 'h-recipe', 'h-review']
-            
-            for class_name in microformat_classes:
-                elements = soup.find_all(class_=class_name)
-                
+            for class_name, elements in elements_by_class.items():
+                item_type, selector = _MICROFORMAT_ITEM_TYPES[class_name]
                 for element in elements:
                     try:
-                        item_data = {}
-                        
                         # Extract properties based on microformat class
-                        if class_name == 'h-card':
-                            item_data = self._extract_h_card(element)
-                        elif class_name == 'h-entry':
-                            item_data = self._extract_h_entry(element)
-                        elif class_name == 'h-event':
-                            item_data = self._extract_h_event(element)
-                        elif class_name == 'h-product':
-                            item_data = self._extract_h_product(element)
-                        elif class_name == 'h-recipe':
-                            item_data = self._extract_h_recipe(element)
-                        elif class_name == 'h-review':
-                            item_data = self._extract_h_review(element)
+                        item_data = self._extract_microformat(element, class_name)
                         
                         if item_data:
                             items.append(StructuredDataItem(
-                                type=class_name[2:].title(),  # Remove 'h-' prefix and capitalize
+                                type=item_type,
                                 data=item_data,
                                 source='microformat',
                                 url=url,
-                                selector=f".{class_name}"
+                                selector=selector
                             ))
                             
                     except Exception as e:
@@ -410,175 +739,73 @@ class StructuredDataExtractor:
         
         return items
     
-    def _extract_h_card(self, element: Tag) -> Dict[str, Any]:
-        """Extract h-card microformat data"""
-        data = {}
-        
-        # Extract name
-        name_elem = element.find(class_='p-name')
-        if name_elem:
-            data['name'] = name_elem.get_text(strip=True)
-        
-        # Extract URL
-        url_elem = element.find(class_='u-url')
-        if url_elem:
-            data['url'] = url_elem.get('href') or url_elem.get_text(strip=True)
-        
-        # Extract photo
-        photo_elem = element.find(class_='u-photo')
-        if photo_elem:
-            data['photo'] = photo_elem.get('src') or photo_elem.get_text(strip=True)
-        
-        # Extract organization
-        org_elem = element.find(class_='p-org')
-        if org_elem:
-            data['organization'] = org_elem.get_text(strip=True)
-        
-        return data
-    
-    def _extract_h_entry(self, element: Tag) -> Dict[str, Any]:
-        """Extract h-entry microformat data"""
-        data = {}
-        
-        # Extract title
-        title_elem = element.find(class_='p-name')
-        if title_elem:
-            data['title'] = title_elem.get_text(strip=True)
-        
-        # Extract content
-        content_elem = element.find(class_='e-content')
-        if content_elem:
-            data['content'] = content_elem.get_text(strip=True)
-        
-        # Extract published date
-        published_elem = element.find(class_='dt-published')
-        if published_elem:
-            data['published'] = published_elem.get_text(strip=True)
-        
-        # Extract author
-        author_elem = element.find(class_='p-author')
-        if author_elem:
-            data['author'] = author_elem.get_text(strip=True)
-        
-        return data
-    
-    def _extract_h_event(self, element: Tag) -> Dict[str, Any]:
-        """Extract h-event microformat data"""
-        data = {}
-        
-        # Extract name
-        name_elem = element.find(class_='p-name')
-        if name_elem:
-            data['name'] = name_elem.get_text(strip=True)
-        
-        # Extract start date
-        start_elem = element.find(class_='dt-start')
-        if start_elem:
-            data['start'] = start_elem.get_text(strip=True)
-        
-        # Extract end date
-        end_elem = element.find(class_='dt-end')
-        if end_elem:
-            data['end'] = end_elem.get_text(strip=True)
-        
-        # Extract location
-        location_elem = element.find(class_='p-location')
-        if location_elem:
-            data['location'] = location_elem.get_text(strip=True)
+    def _extract_microformat(self, element: HtmlElement, class_name: str) -> Dict[str, Any]:
+        """Extract the properties of one microformat root in a single descendant pass"""
+        properties = _MICROFORMAT_PROPERTIES[class_name]
+        by_class = {prop.class_name: prop for prop in properties}
+        found = {}
+        
+        for descendant in element.iterdescendants(etree.Element):
+            classes = descendant.get('class')
+            if not classes:
+                continue
+            for token in set(classes.split()):
+                prop = by_class.get(token)
+                if prop is None:
+                    continue
+                if prop.multiple:
+                    found.setdefault(token, []).append(descendant)
+                elif token not in found:
+                    found[token] = descendant
         
-        return data
-    
-    def _extract_h_product(self, element: Tag) -> Dict[str, Any]:
-        """Extract h-product microformat data"""
+        # Assemble in schema order; single properties use the first match
         data = {}
-        
-        # Extract name
-        name_elem = element.find(class_='p-name')
-        if name_elem:
-            data['name'] = name_elem.get_text(strip=True)
-        
-        # Extract price
-        price_elem = element.find(class_='p-price')
-        if price_elem:
-            data['price'] = price_elem.get_text(strip=True)
-        
-        # Extract brand
-        brand_elem = element.find(class_='p-brand')
-        if brand_elem:
-            data['brand'] = brand_elem.get_text(strip=True)
-        
-        # Extract category
-        category_elem = element.find(class_='p-category')
-        if category_elem:
-            data['category'] = category_elem.get_text(strip=True)
-        
-        return data
-    
-    def _extract_h_recipe(self, element: Tag) -> Dict[str, Any]:
-        """Extract h-recipe microformat data"""
-        data = {}
-        
-        # Extract name
-        name_elem = element.find(class_='p-name')
-        if name_elem:
-            data['name'] = name_elem.get_text(strip=True)
-        
-        # Extract ingredients
-        ingredients = element.find_all(class_='p-ingredient')
-        if ingredients:
-            data['ingredients'] = [ing.get_text(strip=True) for ing in ingredients]
-        
-        # Extract instructions
-        instructions = element.find_all(class_='e-instructions')
-        if instructions:
-            data['instructions'] = [inst.get_text(strip=True) for inst in instructions]
-        
-        # Extract cooking time
-        time_elem = element.find(class_='dt-duration')
-        if time_elem:
-            data['cooking_time'] = time_elem.get_text(strip=True)
+        for prop in properties:
+            match = found.get(prop.class_name)
+            if match is None:
+                continue
+            if prop.multiple:
+                data[prop.key] = [_get_text(elem) for elem in match]
+            elif prop.attribute:
+                data[prop.key] = match.get(prop.attribute) or _get_text(match)
+            else:
+                data[prop.key] = _get_text(match)
         
         return data
     
-    def _extract_h_review(self, element: Tag) -> Dict[str, Any]:
-        """Extract h-review microformat data"""
-        data = {}
-        
-        # Extract item reviewed
-        item_elem = element.find(class_='p-item')
-        if item_elem:
-            data['item'] = item_elem.get_text(strip=True)
-        
-        # Extract rating
-        rating_elem = element.find(class_='p-rating')
-        if rating_elem:
-            data['rating'] = rating_elem.get_text(strip=True)
+    def _compile_custom_selectors(self, custom_selectors: Dict[str, Dict[str, Any]]) -> List[Tuple[str, Dict[str, Any], etree.XPath, List[Tuple[str, etree.XPath]]]]:
+        """Compile each custom selector and its nested selectors to XPath"""
+        compiled = []
         
-        # Extract review content
-        content_elem = element.find(class_='e-content')
-        if content_elem:
-            data['content'] = content_elem.get_text(strip=True)
-        
-        # Extract reviewer
-        reviewer_elem = element.find(class_='p-reviewer')
-        if reviewer_elem:
-            data['reviewer'] = reviewer_elem.get_text(strip=True)
+        for selector_name, selector_config in custom_selectors.items():
+            try:
+                selector = selector_config.get('selector')
+                if not selector:
+                    continue
+                
+                nested_selectors = selector_config.get('nested_selectors', {})
+                compiled.append((
+                    selector_name,
+                    selector_config,
+                    _compile_css(selector),
+                    [(key, _compile_css(nested)) for key, nested in nested_selectors.items()]
+                ))
+                
+            except Exception as e:
+                logger.error(f"Error processing custom selector {selector_name}: {e}")
         
-        return data
+        return compiled
     
-    def _extract_custom_selectors(self, soup: BeautifulSoup, url: str) -> List[StructuredDataItem]:
+    def _extract_custom_selectors(self, tree: HtmlElement, url: str) -> List[StructuredDataItem]:
         """Extract data using custom CSS selectors"""
         items = []
         
-        for selector_name, selector_config in self.custom_selectors.items():
+        for selector_name, selector_config, selector_xpath, nested_xpaths in self._compiled_selectors:
             try:
-                selector = selector_config.get('selector')
+                selector = selector_config['selector']
                 data_type = selector_config.get('type', 'Custom')
                 
-                if not selector:
-                    continue
-                
-                elements = soup.select(selector)
+                elements = selector_xpath(tree)
                 
                 for element in elements:
                     try:
@@ -587,7 +814,7 @@ class StructuredDataExtractor:
                         
                         # Extract text content
                         if selector_config.get('extract_text', True):
-                            item_data['text'] = element.get_text(strip=True)
+                            item_data['text'] = _get_text(element)
                         
                         # Extract attributes
                         attributes = selector_config.get('attributes', [])
@@ -597,14 +824,13 @@ class StructuredDataExtractor:
                                 item_data[attr] = value
                         
                         # Extract nested elements
-                        nested_selectors = selector_config.get('nested_selectors', {})
-                        for key, nested_selector in nested_selectors.items():
-                            nested_elements = element.select(nested_selector)
+                        for key, nested_xpath in nested_xpaths:
+                            nested_elements = nested_xpath(element)
                             if nested_elements:
                                 if len(nested_elements) == 1:
-                                    item_data[key] = nested_elements[0].get_text(strip=True)
+                                    item_data[key] = _get_text(nested_elements[0])
                                 else:
-                                    item_data[key] = [elem.get_text(strip=True) for elem in nested_elements]
+                                    item_data[key] = [_get_text(elem) for elem in nested_elements]
                         
                         if item_data:
                             items.append(StructuredDataItem(
@@ -625,7 +851,7 @@ class StructuredDataExtractor:
         
         return items
     
-    def _extract_property_value(self, element: Tag) -> Any:
+    def _extract_property_value(self, element: HtmlElement) -> Any:
         """Extract value from a property element"""
         # Check for content attribute first
         content = element.get('content')
@@ -643,68 +869,69 @@ class StructuredDataExtractor:
             return src
         
         # Get text content
-        text = element.get_text(strip=True)
+        text = _get_text(element)
         if text:
             return text
         
         return None
     
     def _clean_extracted_data(self, items: List[StructuredDataItem], base_url: str) -> List[StructuredDataItem]:
-        """Clean and normalize extracted data"""
-        cleaned_items = []
+        """
+        Clean and normalize extracted data
         
+        _clean_data_dict works in place, so each item keeps its own data dict
+        and is reused as-is instead of being rebuilt.
+        """
         for item in items:
             try:
-                cleaned_data = self._clean_data_dict(item.data, base_url)
-                
-                cleaned_item = StructuredDataItem(
-                    type=item.type,
-                    data=cleaned_data,
-                    source=item.source,
-                    url=item.url,
-                    selector=item.selector,
-                    confidence=item.confidence,
-                    validation_errors=item.validation_errors
-                )
-                
-                cleaned_items.append(cleaned_item)
-                
+                self._clean_data_dict(item.data, base_url)
             except Exception as e:
                 logger.warning(f"Error cleaning item {item.type}: {e}")
-                cleaned_items.append(item)
         
-        return cleaned_items
+        return items
     
     def _clean_data_dict(self, data: Dict[str, Any], base_url: str) -> Dict[str, Any]:
-        """Clean a data dictionary recursively"""
-        cleaned = {}
-        
-        for key, value in data.items():
-            if isinstance(value, dict):
-                cleaned[key] = self._clean_data_dict(value, base_url)
-            elif isinstance(value, list):
-                cleaned[key] = [self._clean_data_dict(item, base_url) if isinstance(item, dict) else item for item in value]
-            elif isinstance(value, str):
-                cleaned_value = value.strip()
-                
-                # Normalize URLs
-                if self.normalize_urls and self._is_url_field(key):
-                    cleaned_value = self._normalize_url(cleaned_value, base_url)
-                
-                # Clean common issues
-                cleaned_value = self._clean_string_value(cleaned_value)
-                
-                if cleaned_value:
-                    cleaned[key] = cleaned_value
-            else:
-                cleaned[key] = value
+        """
+        Clean a data dictionary and every dictionary nested in it
         
-        return cleaned
+        Works in place with an explicit stack instead of recursing, so deeply
+        nested JSON-LD graphs cost neither a Python frame nor a new dict per level.
+        """
+        stack = [data]
+        
+        while stack:
+            current = stack.pop()
+            
+            for key, value in list(current.items()):
+                if isinstance(value, dict):
+                    stack.append(value)
+                elif isinstance(value, list):
+                    stack.extend(item for item in value if isinstance(item, dict))
+                elif isinstance(value, str):
+                    cleaned_value = value.strip()
+                    
+                    if self._is_url_field(key):
+                        # URLs skip entity decoding: their query strings
+                        # legitimately contain '&name=' sequences
+                        if self.normalize_urls:
+                            cleaned_value = self._normalize_url(cleaned_value, base_url)
+                    else:
+                        # Clean common issues
+                        cleaned_value = self._clean_string_value(cleaned_value)
+                    
+                    if cleaned_value:
+                        current[key] = cleaned_value
+                    else:
+                        del current[key]
+        
+        return data
     
-    def _is_url_field(self, field_name: str) -> bool:
-        """Check if a field name suggests it contains a URL"""
-        url_indicators = ['url', 'href', 'src', 'link', 'image', 'photo', 'logo', 'icon']
-        return any(indicator in field_name.lower() for indicator in url_indicators)
+    @staticmethod
+    @lru_cache(maxsize=512)
+    def _is_url_field(field_name: str) -> bool:
+        """Check if a field name suggests it contains a URL (cached: field names repeat heavily)"""
+        field_name = field_name.lower()
+        return any(indicator in field_name for indicator in _URL_INDICATORS)
     
     def _normalize_url(self, url: str, base_url: str) -> str:
         """Normalize a URL relative to base URL"""
@@ -712,16 +939,14 @@ class StructuredDataExtractor:
             return url
         
         try:
-            # Handle relative URLs
-            if url.startswith('//'):
-                parsed_base = urlparse(base_url)
-                return f"{parsed_base.scheme}:{url}"
-            elif url.startswith('/'):
-                return urljoin(base_url, url)
-            elif not url.startswith(('http://', 'https://')):
-                return urljoin(base_url, url)
-            else:
+            # Absolute URLs are the common case and need no work
+            if url.startswith(('http://', 'https://')):
                 return url
+            # Protocol-relative URLs take the page's scheme
+            if url.startswith('//'):
+                return f"{_base_scheme(base_url)}:{url}"
+            # Everything else is relative to the page
+            return urljoin(base_url, url)
         except Exception:
             return url
     
@@ -730,15 +955,11 @@ class StructuredDataExtractor:
         if not value:
             return value
         
-        # Remove excessive whitespace
-        value = re.sub(r'\s+', ' ', value)
-        
-        # Remove common HTML entities
-        value = value.replace('&nbsp;', ' ')
-        value = value.replace('&amp;', '&')
-        value = value.replace('&lt;', '<')
-        value = value.replace('&gt;', '>')
-        value = value.replace('&quot;', '"')
+        # Decode complete HTML entities, then collapse whitespace (including
+        # the non-breaking spaces produced by &nbsp;)
+        if '&' in value:
+            value = _ENTITY_RE.sub(_unescape_entity, value)
+        value = _WHITESPACE_RE.sub(' ', value)
         
         return value.strip()
     
@@ -750,20 +971,13 @@ class StructuredDataExtractor:
             validation_errors = []
             
             try:
-                # Validate required fields based on type
-                if item.type == 'Product':
-                    validation_errors.extend(self._validate_product(item.data))
-                elif item.type == 'Article':
-                    validation_errors.extend(self._validate_article(item.data))
-                elif item.type == 'Event':
-                    validation_errors.extend(self._validate_event(item.data))
-                elif item.type == 'Organization':
-                    validation_errors.extend(self._validate_organization(item.data))
-                elif item.type == 'Person':
-                    validation_errors.extend(self._validate_person(item.data))
+                # Validate required fields based on type (JSON-LD may give a list of types)
+                validate = self._TYPE_VALIDATORS.get(item.type) if isinstance(item.type, str) else None
+                if validate is not None:
+                    validation_errors.extend(validate(self, item.data))
                 
                 # Validate URLs
-                validation_errors.extend(self._validate_urls(item.data))
+                self._validate_urls(item.data, validation_errors, item.url)
                 
                 # Update item with validation errors
                 item.validation_errors = validation_errors
@@ -835,23 +1049,26 @@ class StructuredDataExtractor:
         
         return errors
     
-    def _validate_urls(self, data: Dict[str, Any]) -> List[str]:
-        """Validate URLs in data"""
-        errors = []
-        
-        def check_urls(obj):
-            if isinstance(obj, dict):
-                for key, value in obj.items():
-                    if self._is_url_field(key) and isinstance(value, str):
-                        if not validators.url(value):
-                            errors.append(f"Invalid URL in field '{key}': {value}")
-                    elif isinstance(value, (dict, list)):
-                        check_urls(value)
-            elif isinstance(obj, list):
-                for item in obj:
-                    check_urls(item)
-        
-        check_urls(data)
+    # Required-field validators by item type
+    _TYPE_VALIDATORS = {
+        'Product': _validate_product,
+        'Article': _validate_article,
+        'Event': _validate_event,
+        'Organization': _validate_organization,
+        'Person': _validate_person,
+    }
+    
+    def _validate_urls(self, data: Dict[str, Any], errors: Optional[List[str]] = None,
+                       base_url: str = '') -> List[str]:
+        """Validate URLs in data, appending to errors when a list is given"""
+        if errors is None:
+            errors = []
+        if not isinstance(data, (dict, list)):
+            return errors
+        
+        is_valid_url = validators.url if self.strict_url_validation else _is_http_url
+        scheme = 'http' if base_url.startswith('http:') else 'https'
+        _walk_urls(data, errors, self._is_url_field, is_valid_url, scheme)
         return errors
     
     def _calculate_summary(self, items: List[StructuredDataItem]) -> Dict[str, int]:
@@ -870,7 +1087,7 @@ class StructuredDataExtractor:
         }
         
         for item in items:
-            summary[item.source] += 1
+            summary[item.source.replace('-', '_')] += 1
             
             if item.validation_errors:
                 summary['with_errors'] += 1
@@ -910,11 +1127,11 @@ class StructuredDataExtractor:
             export_data = {
                 'extraction_time': datetime.now().isoformat(),
                 'total_items': len(items),
-                'items': [asdict(item) for item in items]
+                'items': items
             }
             
-            with open(file_path, 'w', encoding='utf-8') as f:
-                json.dump(export_data, f, indent=2, default=str)
+            with open(file_path, 'wb') as f:
+                f.write(_json_dumps_pretty(export_data))
             
             logger.info(f"Structured data exported to {file_path}")
             return True
@@ -928,23 +1145,26 @@ class StructuredDataExtractor:
         try:
             import csv
             
-            with open(file_path, 'w', newline='', encoding='utf-8') as f:
+            # A 1 MiB buffer keeps large exports from flushing row by row
+            with open(file_path, 'w', newline='', encoding='utf-8', buffering=1 << 20) as f:
                 writer = csv.writer(f)
                 
                 # Write header
                 writer.writerow(['Type', 'Source', 'URL', 'Selector', 'Confidence', 'Data', 'Validation Errors'])
                 
-                # Write data
-                for item in items:
-                    writer.writerow([
+                # Write data in a single call
+                writer.writerows(
+                    (
                         item.type,
                         item.source,
                         item.url,
                         item.selector or '',
                         item.confidence,
-                        json.dumps(item.data, ensure_ascii=False),
+                        _json_dumps_compact(item.data),
                         '; '.join(item.validation_errors) if item.validation_errors else ''
-                    ])
+                    )
+                    for item in items
+                )
             
             logger.info(f"Structured data exported to {file_path}")
             return True
@@ -5,24 +5,117 @@ Módulo de descubrimiento de URLs para Scrapelillo
 Basado en el script forcedor.py pero adaptado para integración con la GUI
 """
 
+import asyncio
+import codecs
 import logging
-import time
 import socket
 import sys
 import os
 import re
 import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
 from urllib.parse import urljoin, urlparse
-from typing import Set, List, Dict, Optional, Callable
+from typing import Set, List, Dict, Iterable, Optional, Callable, Tuple
 from dataclasses import dataclass
 from datetime import datetime
 
+import aiohttp
+import lxml.etree as etree
+import lxml.html
 import requests
-from bs4 import BeautifulSoup
+from lxml.html import HtmlElement
+from requests.adapters import HTTPAdapter
 from urllib import robotparser
 
+# requests/urllib3 y aiohttp solo descomprimen brotli si hay un decodificador instalado
+try:
+    import brotli
+    BROTLI_AVAILABLE = True
+except ImportError:
+    try:
+        import brotlicffi as brotli
+        BROTLI_AVAILABLE = True
+    except ImportError:
+        BROTLI_AVAILABLE = False
+
 logger = logging.getLogger(__name__)
 
+# Sondas de fuzzing en vuelo a la vez; también dimensiona el pool de conexiones
+_FUZZ_WORKERS = 20
+
+# robots.txt ya descargados, por URL, compartidos entre motores del mismo sitio:
+# (instante de descarga, parser), en orden LRU. Caducan tras _ROBOTS_TTL segundos
+# (RFC 9309 pide no usar una copia de más de 24 h) y se guardan como mucho
+# _ROBOTS_CACHE_SIZE sitios
+_ROBOTS_CACHE: 'OrderedDict[str, Tuple[float, robotparser.RobotFileParser]]' = OrderedDict()
+_ROBOTS_CACHE_LOCK = threading.Lock()
+_ROBOTS_CACHE_SIZE = 256
+_ROBOTS_TTL = 3600
+_ROBOTS_TIMEOUT = 5
+
+# Endpoints referenciados desde JavaScript, en una sola alternancia para recorrer
+# cada script una vez. Las rutas con extensión se prueban primero para que
+# '/api/data.json' no se corte en '/api/data'
+_ENDPOINT_RE = re.compile(
+    r'/[A-Za-z0-9_\-/]+\.(?:json|xml|html)'
+    r'|/api/[A-Za-z0-9_\-/]+'
+    r'|/v\d+/[A-Za-z0-9_\-/]+'
+)
+
+# Ningún endpoint cruza un carácter fuera de [A-Za-z0-9_-/.]: al leer JS por
+# bloques, solo lo que sigue al último de esos separadores puede continuar en
+# el bloque siguiente
+_ENDPOINT_TAIL_RE = re.compile(r'[^A-Za-z0-9_\-/.][A-Za-z0-9_\-/.]*\Z')
+_JS_CHUNK_SIZE = 65536
+
+# Atributos que interesan, seleccionados en C por lxml en lugar de recorrer y
+# filtrar todas las etiquetas desde Python
+_HREF_XPATH = etree.XPath('//a/@href', smart_strings=False)
+_SCRIPT_SRC_XPATH = etree.XPath('//script/@src', smart_strings=False)
+
+# Enlaces que nunca llevan a otra página del sitio: se descartan sin parsearlos
+_SKIP_HREF_PREFIXES = ('#', 'javascript:', 'mailto:', 'tel:')
+
+def _parse_html(html: str) -> HtmlElement:
+    """Parsea una página con lxml, tolerando documentos vacíos"""
+    try:
+        return lxml.html.document_fromstring(html)
+    except ValueError:
+        # lxml rechaza str con declaración de codificación XML
+        return lxml.html.document_fromstring(html.encode('utf-8'))
+    except etree.ParserError:
+        return lxml.html.document_fromstring('<html></html>')
+
+# Puerto por defecto de cada esquema; solo ese se quita al comparar hosts
+_DEFAULT_PORTS = {'http': ':80', 'https': ':443'}
+
+def _host_key(netloc: str, scheme: str) -> str:
+    """Netloc en minúsculas y sin el puerto por defecto de su esquema, para comparar hosts"""
+    netloc = netloc.lower()
+    default_port = _DEFAULT_PORTS.get(scheme)
+    if default_port and netloc.endswith(default_port):
+        netloc = netloc[:-len(default_port)]
+    return netloc
+
+def _normalize_links(base_url: str, hrefs: Iterable[str], netloc: str) -> List[str]:
+    """
+    Resuelve los href de una página y devuelve las URLs del sitio normalizadas
+    
+    Menús, miniaturas y títulos repiten los mismos enlaces, así que los href se
+    deduplican antes de resolverlos y el resultado sale sin duplicados y en
+    orden de aparición. netloc es el host del sitio ya pasado por _host_key.
+    """
+    links = {}
+    for raw_href in dict.fromkeys(hrefs):
+        if not raw_href or raw_href.startswith(_SKIP_HREF_PREFIXES):
+            continue
+        p = urlparse(urljoin(base_url, raw_href))
+        if p.scheme in ('http', 'https') and (p.netloc == netloc or _host_key(p.netloc, p.scheme) == netloc):
+            links[p._replace(fragment='').geturl().rstrip('/')] = None
+    return list(links)
+
 @dataclass
 class DiscoveryResult:
     """Resultado del descubrimiento de URLs"""
@@ -57,7 +150,8 @@ class URLDiscoveryEngine:
                  max_urls: Optional[int] = None, 
                  user_agent: Optional[str] = None,
                  timeout: int = 10,
-                 max_depth: int = 3):
+                 max_depth: int = 3,
+                 concurrency: int = 5):
         """
         Inicializa el motor de descubrimiento
         
@@ -68,20 +162,39 @@ class URLDiscoveryEngine:
             user_agent: User-Agent personalizado
             timeout: Timeout para requests
             max_depth: Profundidad máxima de crawling
+            concurrency: Máximo de páginas descargándose a la vez
         """
         self.base_url = self._normalize_url(base_url)
+        base = urlparse(self.base_url)
+        self._base_netloc = _host_key(base.netloc, base.scheme)
         self.delay = delay
         self.max_urls = max_urls
         self.timeout = timeout
         self.max_depth = max_depth
+        self.concurrency = max(1, concurrency)
         
         # Headers
         ua = user_agent or self.DEFAULT_UA
-        self.headers = {'User-Agent': ua}
+        # Se anuncia 'br' solo si se puede decodificar; HTML y JS comprimen
+        # bastante mejor con brotli que con gzip
+        self.headers = {
+            'User-Agent': ua,
+            'Accept-Encoding': 'br, gzip, deflate' if BROTLI_AVAILABLE else 'gzip, deflate',
+            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+        }
+        
+        # Sesión con keep-alive para el fuzzing: las sondas al mismo host
+        # reutilizan la conexión en lugar de repetir TCP+TLS en cada una
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+        adapter = HTTPAdapter(pool_connections=_FUZZ_WORKERS, pool_maxsize=_FUZZ_WORKERS, max_retries=0)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
         
         # Estado interno
         self.visited = set()
-        self.to_visit = [(self.base_url, 0)]  # (url, depth)
+        self.to_visit = deque([(self.base_url, 0)])  # (url, depth)
+        self.pending = {self.base_url}  # URLs en to_visit, para comprobar en O(1)
         self.visited_js = set()
         self.discovered_endpoints = set()
         self.fuzz_results = {}
@@ -127,15 +240,53 @@ class URLDiscoveryEngine:
         return f"{parsed.scheme}://{domain}".rstrip('/')
     
     def _setup_robots_txt(self):
-        """Configura el parser de robots.txt"""
-        self.robots = robotparser.RobotFileParser()
+        """
+        Configura el parser de robots.txt
+        
+        Equivale a RobotFileParser.read(), pero con la sesión del motor y un
+        timeout corto: un robots.txt que no responde ya no bloquea el constructor.
+        """
         robots_url = urljoin(self.base_url, '/robots.txt')
-        self.robots.set_url(robots_url)
+        self.robots = self._cached_robots(robots_url)
+        if self.robots is not None:
+            return
+        
         try:
-            self.robots.read()
+            r = self.session.get(robots_url, timeout=_ROBOTS_TIMEOUT)
         except Exception as e:
             logger.warning(f"robots.txt read error at {robots_url}: {e}")
-            self.robots = None
+            return
+        
+        robots = robotparser.RobotFileParser(robots_url)
+        if r.status_code in (401, 403):
+            robots.disallow_all = True
+        elif 400 <= r.status_code < 500:
+            robots.allow_all = True
+        elif r.status_code < 400:
+            robots.parse(r.content.decode('utf-8', errors='replace').splitlines())
+        self.robots = robots
+        
+        # Un 5xx puede ser pasajero: se vuelve a pedir en el siguiente motor
+        if r.status_code < 500:
+            with _ROBOTS_CACHE_LOCK:
+                _ROBOTS_CACHE[robots_url] = (time.monotonic(), robots)
+                _ROBOTS_CACHE.move_to_end(robots_url)
+                if len(_ROBOTS_CACHE) > _ROBOTS_CACHE_SIZE:
+                    _ROBOTS_CACHE.popitem(last=False)
+    
+    @staticmethod
+    def _cached_robots(robots_url: str) -> Optional[robotparser.RobotFileParser]:
+        """Devuelve el robots.txt en cache si no ha caducado; si caducó, lo descarta"""
+        with _ROBOTS_CACHE_LOCK:
+            entry = _ROBOTS_CACHE.get(robots_url)
+            if entry is None:
+                return None
+            fetched_at, robots = entry
+            if time.monotonic() - fetched_at >= _ROBOTS_TTL:
+                del _ROBOTS_CACHE[robots_url]
+                return None
+            _ROBOTS_CACHE.move_to_end(robots_url)
+            return robots
     
     def allowed(self, url: str) -> bool:
         """Verifica si la URL está permitida por robots.txt"""
@@ -161,117 +312,215 @@ class URLDiscoveryEngine:
         """Cancela el descubrimiento"""
         self._cancel_requested = True
     
+    def close(self):
+        """Cierra las conexiones abiertas de la sesión HTTP"""
+        self.session.close()
+    
     def discover(self) -> DiscoveryResult:
         """Ejecuta el descubrimiento de URLs"""
+        return asyncio.run(self.discover_async())
+    
+    async def discover_async(self) -> DiscoveryResult:
+        """
+        Ejecuta el descubrimiento de URLs con varias páginas en vuelo
+        
+        Hasta `concurrency` descargas se solapan, pero el inicio de cada página
+        sigue espaciado `delay` segundos, así que el ritmo de peticiones al sitio
+        no aumenta: solo deja de esperarse la latencia de una antes de la otra.
+        """
         start_time = datetime.now()
+        self._next_request_at = 0.0
+        self._js_semaphore = asyncio.Semaphore(self.concurrency)
+        in_flight = set()
+        task_urls = {}  # tarea -> URL, para atribuir los fallos a su página
         
         try:
-            while self.to_visit and not self._cancel_requested:
-                current_url, depth = self.to_visit.pop(0)
-                
-                if current_url in self.visited:
-                    continue
-                
-                if self.max_urls and len(self.visited) >= self.max_urls:
-                    logger.info("Reached max URL limit.")
-                    break
-                
-                if depth > self.max_depth:
-                    continue
-                
-                if not self.allowed(current_url):
-                    logger.info(f"Blocked by robots.txt: {current_url}")
-                    self.visited.add(current_url)
-                    continue
-                
-                # Callback de progreso
-                if self.progress_callback:
-                    self.progress_callback(f"Descubriendo: {current_url}", len(self.visited), len(self.discovered_endpoints))
+            timeout = aiohttp.ClientTimeout(total=self.timeout)
+            async with aiohttp.ClientSession(headers=self.headers, timeout=timeout) as session:
+                limit_reached = False
                 
-                try:
-                    resp = requests.get(current_url, headers=self.headers, timeout=self.timeout)
-                    resp.raise_for_status()
-                    self.total_requests += 1
-                except requests.exceptions.RequestException as e:
-                    msg = str(e)
-                    # HTTPS->HTTP fallback
-                    if isinstance(e, requests.exceptions.ConnectionError) and 'getaddrinfo failed' in msg and current_url.startswith('https://'):
-                        fallback = 'http://' + current_url[len('https://'):]
-                        logger.info(f"Retry HTTP: {fallback}")
-                        self.to_visit.insert(0, (fallback, depth))
-                        continue
-                    # Skip 403
-                    if isinstance(e, requests.exceptions.HTTPError) and e.response is not None and e.response.status_code == 403:
-                        logger.warning(f"403 Forbidden: {current_url}")
+                while not self._cancel_requested:
+                    # Lanzar páginas de la cola hasta llenar los huecos libres
+                    while self.to_visit and len(in_flight) < self.concurrency and not limit_reached and not self._cancel_requested:
+                        current_url, depth = self.to_visit.popleft()
+                        self.pending.discard(current_url)
+                        
+                        if current_url in self.visited:
+                            continue
+                        
+                        if self.max_urls and len(self.visited) >= self.max_urls:
+                            logger.info("Reached max URL limit.")
+                            limit_reached = True
+                            break
+                        
+                        if depth > self.max_depth:
+                            continue
+                        
+                        if not self.allowed(current_url):
+                            logger.info(f"Blocked by robots.txt: {current_url}")
+                            self.visited.add(current_url)
+                            continue
+                        
+                        # Callback de progreso
+                        if self.progress_callback:
+                            self.progress_callback(f"Descubriendo: {current_url}", len(self.visited), len(self.discovered_endpoints))
+                        
+                        # Se marca antes de descargarla para que no se pida dos veces mientras está en vuelo
                         self.visited.add(current_url)
-                        continue
+                        task = asyncio.ensure_future(self._crawl_page(session, current_url, depth))
+                        task_urls[task] = current_url
+                        in_flight.add(task)
                     
-                    error_msg = f"Fetch error for {current_url}: {e}"
-                    logger.warning(error_msg)
-                    self.errors.append(error_msg)
-                    if self.error_callback:
-                        self.error_callback(current_url, str(e))
+                    if not in_flight:
+                        break
                     
-                    self.visited.add(current_url)
-                    time.sleep(self.delay)
-                    continue
-                
-                self.visited.add(current_url)
-                
-                # Callback de URL encontrada
-                if self.url_found_callback:
-                    self.url_found_callback(current_url, depth)
+                    done, in_flight = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+                    for task in done:
+                        self._collect_page(task, task_urls.pop(task))
                 
-                html = resp.text
-                self._extract_links(html, current_url, depth)
-                self._scan_js(html, current_url)
-                time.sleep(self.delay)
+                # Una cancelación deja terminar las páginas que ya estaban en vuelo
+                if in_flight:
+                    done, in_flight = await asyncio.wait(in_flight)
+                    for task in done:
+                        self._collect_page(task, task_urls.pop(task))
                 
         except KeyboardInterrupt:
             logger.info("Interrupted by user.")
+        finally:
+            for task in in_flight:
+                task.cancel()
         
         end_time = datetime.now()
         
+        # El resultado comparte las colecciones del motor en lugar de copiarlas:
+        # en crawls grandes la copia duplicaba la memoria al terminar. El estado
+        # no se vacía porque volver a llamar a discover() tras fuzz() es la forma
+        # de obtener el resultado actualizado (la cola ya está vacía y no se
+        # repite ninguna descarga)
         return DiscoveryResult(
             base_url=self.base_url,
-            discovered_urls=self.visited.copy(),
-            discovered_endpoints=self.discovered_endpoints.copy(),
-            js_files_scanned=self.visited_js.copy(),
-            fuzz_results=self.fuzz_results.copy(),
+            discovered_urls=self.visited,
+            discovered_endpoints=self.discovered_endpoints,
+            js_files_scanned=self.visited_js,
+            fuzz_results=self.fuzz_results,
             start_time=start_time,
             end_time=end_time,
             total_requests=self.total_requests,
-            errors=self.errors.copy()
+            errors=self.errors
         )
     
-    def _extract_links(self, html: str, base_url: str, current_depth: int):
+    def _collect_page(self, task: asyncio.Task, url: str):
+        """
+        Recoge el resultado de una página terminada
+        
+        Un fallo inesperado (parser, callback...) se registra como error de esa
+        página y el crawl sigue con las demás, en lugar de abortar y perder lo
+        descubierto hasta el momento.
+        """
+        try:
+            task.result()
+        except Exception as e:
+            msg = str(e) or type(e).__name__
+            error_msg = f"Page error for {url}: {msg}"
+            logger.warning(error_msg)
+            self.errors.append(error_msg)
+            if self.error_callback:
+                self.error_callback(url, msg)
+    
+    async def _throttle(self):
+        """Espacia el inicio de las descargas de página al menos `delay` segundos"""
+        now = asyncio.get_running_loop().time()
+        wait = self._next_request_at - now
+        self._next_request_at = max(now, self._next_request_at) + self.delay
+        if wait > 0:
+            await asyncio.sleep(wait)
+    
+    async def _crawl_page(self, session: aiohttp.ClientSession, current_url: str, depth: int):
+        """Descarga una página, encola sus enlaces y escanea sus scripts"""
+        await self._throttle()
+        
+        try:
+            async with session.get(current_url) as resp:
+                resp.raise_for_status()
+                html = await resp.text(errors='replace')
+            self.total_requests += 1
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            msg = str(e) or type(e).__name__
+            # HTTPS->HTTP fallback
+            if isinstance(e, aiohttp.ClientConnectorError) and 'getaddrinfo failed' in msg and current_url.startswith('https://'):
+                fallback = 'http://' + current_url[len('https://'):]
+                logger.info(f"Retry HTTP: {fallback}")
+                self.visited.discard(current_url)
+                self.to_visit.appendleft((fallback, depth))
+                self.pending.add(fallback)
+                return
+            # Skip 403
+            if isinstance(e, aiohttp.ClientResponseError) and e.status == 403:
+                logger.warning(f"403 Forbidden: {current_url}")
+                return
+            
+            error_msg = f"Fetch error for {current_url}: {msg}"
+            logger.warning(error_msg)
+            self.errors.append(error_msg)
+            if self.error_callback:
+                self.error_callback(current_url, msg)
+            return
+        
+        # Callback de URL encontrada
+        if self.url_found_callback:
+            self.url_found_callback(current_url, depth)
+        
+        # Una sola pasada de parseo sirve a enlaces y scripts
+        tree = _parse_html(html)
+        self._extract_links(tree, current_url, depth)
+        await self._scan_js(session, tree, current_url)
+    
+    def _extract_links(self, tree: HtmlElement, base_url: str, current_depth: int):
         """Extrae enlaces de la página HTML"""
-        soup = BeautifulSoup(html, 'html.parser')
-        for tag in soup.find_all('a', href=True):
-            href = urljoin(base_url, tag['href'])
-            p = urlparse(href)
-            if p.scheme in ('http', 'https') and p.netloc == urlparse(self.base_url).netloc:
-                norm = p._replace(fragment='').geturl().rstrip('/')
-                if norm not in self.visited and norm not in [url for url, _ in self.to_visit]:
-                    self.to_visit.append((norm, current_depth + 1))
+        links = _normalize_links(base_url, _HREF_XPATH(tree), self._base_netloc)
+        new_urls = [url for url in links if url not in self.visited and url not in self.pending]
+        self.to_visit.extend((url, current_depth + 1) for url in new_urls)
+        self.pending.update(new_urls)
+    
+    def _same_host(self, netloc: str, scheme: str) -> bool:
+        """Indica si un netloc pertenece al sitio, sin distinguir mayúsculas ni el puerto por defecto del esquema"""
+        return netloc == self._base_netloc or _host_key(netloc, scheme) == self._base_netloc
     
-    def _scan_js(self, html: str, base_url: str):
+    async def _scan_js(self, session: aiohttp.ClientSession, tree: HtmlElement, base_url: str):
         """Escanea archivos JavaScript en busca de endpoints"""
-        soup = BeautifulSoup(html, 'html.parser')
-        scripts = [urljoin(base_url, tag['src']) for tag in soup.find_all('script', src=True)]
+        scripts = [urljoin(base_url, src) for src in _SCRIPT_SRC_XPATH(tree)]
         
+        pending = []
         for js_url in scripts:
             p = urlparse(js_url)
-            if p.scheme in ('http', 'https') and p.netloc == urlparse(self.base_url).netloc and js_url not in self.visited_js:
+            if p.scheme in ('http', 'https') and self._same_host(p.netloc, p.scheme) and js_url not in self.visited_js:
                 self.visited_js.add(js_url)
-                self._fetch_and_scan_js(js_url)
+                pending.append(self._fetch_and_scan_js(session, js_url))
+        
+        # Los scripts de una página se descargan a la vez
+        await asyncio.gather(*pending)
     
-    def _fetch_and_scan_js(self, js_url: str):
+    async def _fetch_and_scan_js(self, session: aiohttp.ClientSession, js_url: str):
         """Obtiene y escanea un archivo JavaScript"""
         logger.info(f"Fetching JS: {js_url}")
+        found = set()
         try:
-            r = requests.get(js_url, headers=self.headers, timeout=self.timeout)
-            r.raise_for_status()
+            async with self._js_semaphore:
+                async with session.get(js_url) as r:
+                    r.raise_for_status()
+                    # Se escanea por bloques para no cargar bundles de varios MB enteros
+                    try:
+                        decoder = codecs.getincrementaldecoder(r.charset or 'utf-8')(errors='replace')
+                    except LookupError:
+                        decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+                    tail = ''
+                    async for chunk in r.content.iter_chunked(_JS_CHUNK_SIZE):
+                        text = tail + decoder.decode(chunk)
+                        m = _ENDPOINT_TAIL_RE.search(text)
+                        cut = m.start() + 1 if m else 0
+                        found.update(_ENDPOINT_RE.findall(text, 0, cut))
+                        tail = text[cut:]
+                    found.update(_ENDPOINT_RE.findall(tail + decoder.decode(b'', final=True)))
             self.total_requests += 1
         except Exception as e:
             error_msg = f"JS fetch error for {js_url}: {e}"
@@ -279,28 +528,24 @@ class URLDiscoveryEngine:
             self.errors.append(error_msg)
             return
         
-        # Patrones para encontrar endpoints
-        patterns = [
-            r'/api/v\d+/[A-Za-z0-9_\-/]+',
-            r'/api/[A-Za-z0-9_\-/]+',
-            r'/v\d+/[A-Za-z0-9_\-/]+',
-            r'/[a-z]+/[A-Za-z0-9_\-/]+\.(json|xml|html)',
-            r'/[A-Za-z0-9_\-/]+\.(json|xml|html)'
-        ]
-        
-        for pattern in patterns:
-            matches = set(re.findall(pattern, r.text))
-            for match in matches:
-                if isinstance(match, tuple):
-                    match = ''.join(match)
-                full = urljoin(self.base_url, match)
-                if full not in self.discovered_endpoints:
-                    self.discovered_endpoints.add(full)
-                    if self.endpoint_found_callback:
-                        self.endpoint_found_callback(full)
-                    logger.info(f"Found endpoint: {full}")
+        for match in found:
+            full = urljoin(self.base_url, match)
+            if full not in self.discovered_endpoints:
+                self.discovered_endpoints.add(full)
+                if self.endpoint_found_callback:
+                    self.endpoint_found_callback(full)
+                logger.info(f"Found endpoint: {full}")
     
-    def fuzz(self, wordlist_path: str) -> Dict[str, int]:
+    def _probe(self, url: str) -> Optional[int]:
+        """Lanza una sonda HEAD y devuelve el código de estado, o None si falla"""
+        if self._cancel_requested:
+            return None
+        try:
+            return self.session.head(url, allow_redirects=True, timeout=5).status_code
+        except Exception:
+            return None
+    
+    def fuzz(self, wordlist_path: str, max_workers: int = _FUZZ_WORKERS) -> Dict[str, int]:
         """Ejecuta fuzzing de directorios/archivos"""
         if not os.path.isfile(wordlist_path):
             error_msg = f"Wordlist not found: {wordlist_path}"
@@ -311,27 +556,31 @@ class URLDiscoveryEngine:
         logger.info(f"Starting fuzzing with {wordlist_path}")
         fuzz_results = {}
         
+        probes = []  # (line_num, path, url)
         with open(wordlist_path) as f:
             for line_num, line in enumerate(f, 1):
-                if self._cancel_requested:
-                    break
-                
                 path = line.strip()
                 if not path or path.startswith('#'):
                     continue
-                
-                url = f"{self.base_url}/{path.lstrip('/')}"
+                probes.append((line_num, path, f"{self.base_url}/{path.lstrip('/')}"))
+        
+        # Una sonda HEAD casi no transfiere datos y su coste es la latencia, así
+        # que varias se solapan sobre la sesión compartida. map() devuelve los
+        # códigos en el orden de la wordlist
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            codes = executor.map(self._probe, [url for _, _, url in probes])
+            
+            for (line_num, path, url), code in zip(probes, codes):
+                if self._cancel_requested:
+                    break
                 
                 # Callback de progreso
                 if self.progress_callback and line_num % 10 == 0:
                     self.progress_callback(f"Fuzzing: {path}", len(self.visited), len(self.discovered_endpoints))
                 
-                try:
-                    resp = requests.head(url, headers=self.headers, allow_redirects=True, timeout=5)
-                    code = resp.status_code
-                    self.total_requests += 1
-                except Exception as e:
+                if code is None:
                     continue
+                self.total_requests += 1
                 
                 if code < 400:
                     fuzz_results[url] = code
@@ -7,10 +7,18 @@ Manages user agent rotation with multiple strategies and fake-useragent integrat
 
 import random
 import logging
-from typing import List, Dict, Any, Optional
+import sys
+from typing import List, Dict, Any, Optional, Tuple
 from dataclasses import dataclass, field
 from datetime import datetime
 import threading
+import time
+from functools import lru_cache
+from collections import Counter
+from contextlib import nullcontext
+from itertools import chain, cycle, islice
+
+import numpy as np
 
 try:
     from fake_useragent import UserAgent
@@ -18,16 +26,136 @@ try:
 except ImportError:
     FAKE_USERAGENT_AVAILABLE = False
 
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
 logger = logging.getLogger(__name__)
 
+# Weighted batches at least this large use the JIT-compiled alias sampler
+NUMBA_MIN_BATCH_SIZE = 10000
+
+# dataclass(slots=True) is only available on Python 3.10+
+_DATACLASS_SLOTS = {'slots': True} if sys.version_info >= (3, 10) else {}
+
+# Default modern user agents
+_DEFAULT_AGENTS = (
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+    'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+    'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:109.0) Gecko/20100101 Firefox/121.0',
+    'Mozilla/5.0 (Macintosh; Intel Mac OS X 10.15; rv:109.0) Gecko/20100101 Firefox/121.0',
+    'Mozilla/5.0 (X11; Linux x86_64; rv:109.0) Gecko/20100101 Firefox/121.0',
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Edge/120.0.0.0',
+    'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.1 Safari/605.1.15'
+)
+
+# Returned when rotation is disabled or no agents are loaded
+_DEFAULT_UA = _DEFAULT_AGENTS[0]
+
+
+def _build_alias_table(weights: List[float]) -> Tuple[List[float], List[int]]:
+    """Build a Walker alias table for O(1) sampling proportional to weights"""
+    n = len(weights)
+    total = sum(weights)
+    prob = [w * n / total for w in weights]
+    alias = list(range(n))
+    
+    small = [i for i, p in enumerate(prob) if p < 1.0]
+    large = [i for i, p in enumerate(prob) if p >= 1.0]
+    while small and large:
+        s = small.pop()
+        l = large.pop()
+        alias[s] = l
+        prob[l] -= 1.0 - prob[s]
+        (small if prob[l] < 1.0 else large).append(l)
+    
+    # Leftovers are 1.0 up to rounding error
+    for i in small + large:
+        prob[i] = 1.0
+    
+    return prob, alias
+
+
+@lru_cache(maxsize=8)
+def _load_user_agents(custom_agents: Tuple[str, ...]) -> Tuple[str, ...]:
+    """
+    Load user agents from multiple sources
+    
+    Cached per set of custom agents, so every manager in a process (and
+    workers forked from it) shares one loaded pool instead of querying
+    fake-useragent again.
+    """
+    fake_agents = []
+    
+    # Try to load from fake-useragent if available
+    if FAKE_USERAGENT_AVAILABLE:
+        try:
+            ua = UserAgent()
+            # Get a few random user agents
+            for _ in range(5):
+                try:
+                    random_ua = ua.random
+                    if random_ua:
+                        fake_agents.append(random_ua)
+                except Exception:
+                    continue
+            logger.info("Loaded additional user agents from fake-useragent")
+        except Exception as e:
+            logger.warning(f"Failed to load user agents from fake-useragent: {e}")
+    
+    # Defaults, then custom agents from config, then fake-useragent ones,
+    # deduplicated in a single pass
+    agents = []
+    seen = set()
+    for agent in chain(_DEFAULT_AGENTS, custom_agents, fake_agents):
+        if agent not in seen:
+            seen.add(agent)
+            agents.append(agent)
+    return tuple(agents)
+
+
+def _alias_draw_numpy(prob: np.ndarray, alias: np.ndarray,
+                      u1: np.ndarray, u2: np.ndarray) -> np.ndarray:
+    """Turn pairs of uniform [0, 1) draws into indices sampled from an alias table"""
+    k = (u1 * prob.shape[0]).astype(np.int64)
+    return np.where(u2 < prob[k], k, alias[k])
+
+
+if NUMBA_AVAILABLE:
+    @njit(cache=True)
+    def _alias_draw_jit(prob, alias, u1, u2):
+        """JIT-compiled variant of _alias_draw_numpy"""
+        n = prob.shape[0]
+        out = np.empty(u1.shape[0], dtype=np.int64)
+        for i in range(out.shape[0]):
+            k = int(u1[i] * n)
+            out[i] = k if u2[i] < prob[k] else alias[k]
+        return out
+else:
+    _alias_draw_jit = _alias_draw_numpy
+
 
-@dataclass
+@dataclass(**_DATACLASS_SLOTS)
 class UserAgentStats:
     """User agent usage statistics"""
     total_requests: int = 0
-    usage_count: Dict[str, int] = field(default_factory=dict)
-    last_rotation: Optional[datetime] = None
-    rotation_count: int = 0
+    usage_count: Counter = field(default_factory=Counter)
+    last_rotation_ns: int = 0  # time.monotonic_ns() of the last pick, 0 if none yet
+    
+    @property
+    def rotation_count(self) -> int:
+        """Number of rotations; every request rotates, so this is total_requests"""
+        return self.total_requests
+    
+    @property
+    def last_rotation(self) -> Optional[datetime]:
+        """Wall-clock time of the last pick, converted only when asked for"""
+        if not self.last_rotation_ns:
+            return None
+        return datetime.fromtimestamp(time.time() - (time.monotonic_ns() - self.last_rotation_ns) / 1e9)
 
 
 class UserAgentManager:
@@ -49,7 +177,7 @@ class UserAgentManager:
         self.enabled = ua_config.get('rotation_enabled', True)
         
         if not self.enabled:
-            self.user_agents = []
+            self.user_agents = ()
             self.stats = UserAgentStats()
             logger.info("User agent manager disabled")
             return
@@ -59,60 +187,31 @@ class UserAgentManager:
         self.custom_agents = ua_config.get('custom_agents', [])
         
         # User agent storage
-        self.user_agents: List[str] = []
-        self.current_index = 0
+        self.user_agents: Tuple[str, ...] = ()
         self.stats = UserAgentStats()
         
+        # Weighted strategy: alias table (prob, alias, agents it was built for)
+        self._alias_table: Optional[Tuple[List[float], List[int], Tuple[str, ...]]] = None
+        self._alias_draws = 0
+        
         # Thread safety
         self._lock = threading.Lock()
+        self._tls = threading.local()  # per-thread random.Random, see _rng()
+        self._np_rng = np.random.default_rng()  # batch draws for get_user_agents()
+        # Object array of a pool tuple for batch indexing, kept with that tuple
+        self._agents_array: Tuple[Tuple[str, ...], Optional[np.ndarray]] = ((), None)
         
         # Load user agents
         self._load_user_agents()
+        self._rr_iter = cycle(self.user_agents)
         
         logger.info(f"User agent manager initialized with {len(self.user_agents)} agents")
     
     def _load_user_agents(self):
         """Load user agents from multiple sources"""
-        # Default modern user agents
-        default_agents = [
-            'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-            'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-            'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-            'Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:109.0) Gecko/20100101 Firefox/121.0',
-            'Mozilla/5.0 (Macintosh; Intel Mac OS X 10.15; rv:109.0) Gecko/20100101 Firefox/121.0',
-            'Mozilla/5.0 (X11; Linux x86_64; rv:109.0) Gecko/20100101 Firefox/121.0',
-            'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Edge/120.0.0.0',
-            'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.1 Safari/605.1.15'
-        ]
-        
-        self.user_agents.extend(default_agents)
-        
-        # Add custom agents from config
-        if self.custom_agents:
-            self.user_agents.extend(self.custom_agents)
-        
-        # Try to load from fake-useragent if available
-        if FAKE_USERAGENT_AVAILABLE:
-            try:
-                ua = UserAgent()
-                # Get a few random user agents
-                for _ in range(5):
-                    try:
-                        random_ua = ua.random
-                        if random_ua and random_ua not in self.user_agents:
-                            self.user_agents.append(random_ua)
-                    except Exception:
-                        continue
-                logger.info("Loaded additional user agents from fake-useragent")
-            except Exception as e:
-                logger.warning(f"Failed to load user agents from fake-useragent: {e}")
-        
-        # Remove duplicates
-        self.user_agents = list(dict.fromkeys(self.user_agents))
-        
-        # Initialize stats
-        for agent in self.user_agents:
-            self.stats.usage_count[agent] = 0
+        agents = _load_user_agents(tuple(self.custom_agents or ()))
+        self.user_agents = agents  # immutable, so the cached pool is shared as is
+        self._agents_set = set(agents)  # O(1) membership for add/remove
     
     def get_user_agent(self) -> str:
         """
@@ -122,57 +221,132 @@ class UserAgentManager:
             User agent string
         """
         if not self.enabled or not self.user_agents:
-            return 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
+            return _DEFAULT_UA
         
-        with self._lock:
-            if self.strategy == 'round_robin':
-                user_agent = self._get_round_robin()
-            elif self.strategy == 'random':
-                user_agent = self._get_random()
-            elif self.strategy == 'weighted':
+        # Only the weighted strategy needs the lock: a random pick shares no
+        # state and next() on the round-robin cycle is atomic
+        if self.strategy == 'random':
+            user_agent = self._get_random()
+        elif self.strategy == 'weighted':
+            with self._lock:
                 user_agent = self._get_weighted()
-            else:
-                user_agent = self._get_round_robin()
-            
-            # Update statistics
-            self.stats.total_requests += 1
-            self.stats.usage_count[user_agent] += 1
-            self.stats.rotation_count += 1
-            self.stats.last_rotation = datetime.now()
+        else:
+            user_agent = self._get_round_robin()
+        
+        # Update statistics (best effort: concurrent increments are not locked).
+        # Binding stats once also keeps all three updates on the same object
+        # if reset_stats() swaps it meanwhile
+        stats = self.stats
+        usage_count = stats.usage_count
+        stats.total_requests += 1
+        usage_count[user_agent] = usage_count.get(user_agent, 0) + 1
+        stats.last_rotation_ns = time.monotonic_ns()
+        
+        return user_agent
+    
+    def get_user_agents(self, n: int) -> List[str]:
+        """
+        Get n user agents at once based on rotation strategy
+        
+        Random and weighted picks are drawn as one NumPy batch, which is much
+        cheaper than n get_user_agent() calls when pre-assigning agents to a
+        batch of requests.
+        
+        Args:
+            n: Number of user agents to return
             
-            return user_agent
+        Returns:
+            List of user agent strings
+        """
+        if n <= 0:
+            return []
+        if not self.enabled or not self.user_agents:
+            return [_DEFAULT_UA] * n
+        
+        if self.strategy == 'random':
+            agents = self.user_agents
+            idx = self._np_rng.integers(0, len(agents), size=n)
+            user_agents = self._get_agents_array(agents)[idx].tolist()
+        elif self.strategy == 'weighted':
+            with self._lock:
+                prob, alias, agents = self._get_alias_table(n)
+            draw = _alias_draw_jit if n >= NUMBA_MIN_BATCH_SIZE else _alias_draw_numpy
+            idx = draw(np.asarray(prob, dtype=np.float64), np.asarray(alias, dtype=np.int64),
+                       self._np_rng.random(n), self._np_rng.random(n))
+            user_agents = self._get_agents_array(agents)[idx].tolist()
+        else:
+            user_agents = list(islice(self._rr_iter, n))
+        
+        # Update statistics (best effort, as in get_user_agent)
+        stats = self.stats
+        stats.usage_count.update(user_agents)
+        stats.total_requests += n
+        stats.last_rotation_ns = time.monotonic_ns()
+        
+        return user_agents
+    
+    def _get_agents_array(self, agents: Tuple[str, ...]) -> np.ndarray:
+        """
+        Get agents as a NumPy object array for batch indexing
+        
+        The pool tuple is immutable and replaced on every add/remove, so the
+        array is only rebuilt when a different tuple comes in.
+        """
+        cached_agents, array = self._agents_array
+        if cached_agents is not agents:
+            array = np.array(agents, dtype=object)
+            # One assignment, so lock-free readers never see a mismatched pair
+            self._agents_array = (agents, array)
+        return array
     
     def _get_round_robin(self) -> str:
         """Get user agent using round-robin strategy"""
-        user_agent = self.user_agents[self.current_index % len(self.user_agents)]
-        self.current_index = (self.current_index + 1) % len(self.user_agents)
-        return user_agent
+        return next(self._rr_iter, _DEFAULT_UA)
+    
+    def _rng(self) -> random.Random:
+        """Get this thread's random generator, so threads never share RNG state"""
+        try:
+            return self._tls.rng
+        except AttributeError:
+            rng = self._tls.rng = random.Random()
+            return rng
     
     def _get_random(self) -> str:
         """Get user agent using random strategy"""
-        return random.choice(self.user_agents)
+        agents = self.user_agents
+        # Inline fast path of _rng(): this runs on every request
+        try:
+            rng = self._tls.rng
+        except AttributeError:
+            rng = self._rng()
+        return agents[int(rng.random() * len(agents))]
     
     def _get_weighted(self) -> str:
         """Get user agent using weighted strategy based on usage"""
         if not self.user_agents:
             return self._get_random()
         
-        # Calculate weights (less used = higher weight)
-        weights = []
-        for agent in self.user_agents:
-            usage = self.stats.usage_count.get(agent, 0)
-            weight = 1.0 / (usage + 1)  # Avoid division by zero
-            weights.append(weight)
-        
-        # Normalize weights
-        total_weight = sum(weights)
-        if total_weight > 0:
-            weights = [w / total_weight for w in weights]
-        else:
-            weights = [1.0 / len(self.user_agents)] * len(self.user_agents)
+        prob, alias, agents = self._get_alias_table()
+        rng = self._rng()
+        i = int(rng.random() * len(agents))
+        return agents[i] if rng.random() < prob[i] else agents[alias[i]]
+    
+    def _get_alias_table(self, draws: int = 1) -> Tuple[List[float], List[int], Tuple[str, ...]]:
+        """
+        Get the weighted strategy's alias table, to be called under the lock
         
-        # Choose based on weights
-        return random.choices(self.user_agents, weights=weights)[0]
+        Weights (less used = higher weight) only drift slowly, so the table is
+        rebuilt every max(64, N) picks or when the agent list changes.
+        """
+        agents = self.user_agents
+        table = self._alias_table
+        if table is None or table[2] is not agents or self._alias_draws >= max(64, len(agents)):
+            usage_count = self.stats.usage_count
+            weights = [1.0 / (usage_count.get(agent, 0) + 1) for agent in agents]
+            table = self._alias_table = (*_build_alias_table(weights), agents)
+            self._alias_draws = 0
+        self._alias_draws += draws
+        return table
     
     def add_user_agent(self, user_agent: str) -> bool:
         """
@@ -188,9 +362,11 @@ class UserAgentManager:
             return False
         
         with self._lock:
-            if user_agent not in self.user_agents:
-                self.user_agents.append(user_agent)
-                self.stats.usage_count[user_agent] = 0
+            if user_agent not in self._agents_set:
+                # Replace the tuple: lock-free readers keep a consistent snapshot
+                self.user_agents = self.user_agents + (user_agent,)
+                self._agents_set.add(user_agent)
+                self._rr_iter = cycle(self.user_agents)
                 logger.info(f"Added user agent: {user_agent[:50]}...")
                 return True
         
@@ -210,8 +386,10 @@ class UserAgentManager:
             return False
         
         with self._lock:
-            if user_agent in self.user_agents:
-                self.user_agents.remove(user_agent)
+            if user_agent in self._agents_set:
+                self.user_agents = tuple(agent for agent in self.user_agents if agent != user_agent)
+                self._agents_set.discard(user_agent)
+                self._rr_iter = cycle(self.user_agents)
                 if user_agent in self.stats.usage_count:
                     del self.stats.usage_count[user_agent]
                 logger.info(f"Removed user agent: {user_agent[:50]}...")
@@ -219,39 +397,48 @@ class UserAgentManager:
         
         return False
     
-    def get_user_agent_stats(self) -> Dict[str, Any]:
+    def get_user_agent_stats(self, consistent: bool = False) -> Dict[str, Any]:
         """
         Get user agent statistics
         
+        Args:
+            consistent: Hold the lock so the snapshot cannot interleave with
+                add/remove/reset; by default stats are read without blocking writers
+        
         Returns:
             Dictionary with user agent statistics
         """
         if not self.enabled:
             return {'enabled': False}
         
-        with self._lock:
-            # Calculate usage percentages
-            total_requests = self.stats.total_requests
-            usage_percentages = {}
-            for agent, count in self.stats.usage_count.items():
-                if total_requests > 0:
-                    usage_percentages[agent] = (count / total_requests) * 100
-                else:
-                    usage_percentages[agent] = 0
+        with self._lock if consistent else nullcontext():
+            # Bind once so a lock-free read still sees a single stats object and agent tuple
+            stats = self.stats
+            agents = self.user_agents
             
-            stats = {
+            # Calculate usage percentages in one vectorized pass
+            total_requests = stats.total_requests
+            # Agents never picked have no entry yet but are reported as 0
+            counts_by_agent = stats.usage_count
+            usage_count = {agent: counts_by_agent.get(agent, 0) for agent in agents}
+            if total_requests > 0:
+                counts = np.fromiter(usage_count.values(), dtype=np.float64, count=len(usage_count))
+                usage_percentages = dict(zip(usage_count, (counts / total_requests * 100).tolist()))
+            else:
+                usage_percentages = dict.fromkeys(usage_count, 0)
+            last_rotation = stats.last_rotation
+            
+            return {
                 'enabled': True,
-                'total_agents': len(self.user_agents),
-                'total_requests': self.stats.total_requests,
+                'total_agents': len(agents),
+                'total_requests': total_requests,
                 'rotation_strategy': self.strategy,
-                'rotation_count': self.stats.rotation_count,
-                'last_rotation': self.stats.last_rotation.isoformat() if self.stats.last_rotation else None,
-                'usage_count': dict(self.stats.usage_count),
+                'rotation_count': stats.rotation_count,
+                'last_rotation': last_rotation.isoformat() if last_rotation else None,
+                'usage_count': usage_count,
                 'usage_percentages': usage_percentages,
-                'agents': self.user_agents
+                'agents': list(agents)
             }
-        
-        return stats
     
     def reset_stats(self):
         """Reset user agent statistics"""
@@ -260,8 +447,7 @@ class UserAgentManager:
         
         with self._lock:
             self.stats = UserAgentStats()
-            for agent in self.user_agents:
-                self.stats.usage_count[agent] = 0
+            self._alias_table = None
         
         logger.info("User agent statistics reset")
     
@@ -272,4 +458,4 @@ class UserAgentManager:
         Returns:
             List of user agent strings
         """
-        return self.user_agents.copy() 
\ No newline at end of file
+        return list(self.user_agents) 
\ No newline at end of file